@@ -0,0 +1,101 @@
+"""
+Async versions of ``signup`` and ``login`` for ASGI deployments.
+
+Password hashing runs on the bounded ``password_hashing`` pool instead of
+the worker serving the request. When the pool is saturated, requests are
+turned away with ``503`` so a burst of logins cannot starve the rest of the
+API. Selected with ``ACCOUNTS_ASYNC_VIEWS``.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from .hashing import PoolSaturated, password_hashing
+from .serializers import UserRegistrationSerializer
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+def _bad_request(errors):
+    return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _service_unavailable():
+    response = JsonResponse(
+        {'error': 'The server is busy, please try again shortly.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def signup(request):
+    data = _request_data(request)
+    if data is None:
+        return _bad_request({'error': 'Malformed request body.'})
+
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return _bad_request(serializer.errors)
+
+    try:
+        user = await password_hashing.run(serializer.save)
+    except PoolSaturated:
+        return _service_unavailable()
+
+    return JsonResponse(
+        {
+            'message': 'User registered successfully',
+            'user_id': user.pk
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data = _request_data(request)
+    if data is None:
+        return _bad_request({'error': 'Malformed request body.'})
+
+    try:
+        user = await password_hashing.run(
+            authenticate,
+            username=data.get('username'),
+            password=data.get('password'),
+        )
+    except PoolSaturated:
+        return _service_unavailable()
+
+    if not user:
+        return JsonResponse(
+            {'error': 'Incorrect username or password'},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    token, _ = await Token.objects.aget_or_create(user=user)
+    return JsonResponse(
+        {
+            'token': token.key,
+            'user_id': user.pk,
+        },
+        status=status.HTTP_200_OK,
+    )
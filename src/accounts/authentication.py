@@ -0,0 +1,210 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BasicAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from todoapi.caches import is_shared
+
+
+def _cache():
+    return caches[settings.TOKEN_AUTH_CACHE]
+
+
+def _use_cache():
+    # Only with a shared cache, see todoapi.caches.
+    return settings.TOKEN_AUTH_CACHE_TIMEOUT > 0 and is_shared(
+        settings.TOKEN_AUTH_CACHE
+    )
+
+
+def _token_cache_key(key):
+    # Token keys are credentials, so only a digest of them is used as the
+    # cache key.
+    return 'accounts:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    _cache().delete(_token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` that keeps each resolved token, with its user, in
+    the cache for ``TOKEN_AUTH_CACHE_TIMEOUT`` seconds, so most requests
+    authenticate without a query.
+
+    Entries are dropped as soon as the token is deleted (logout) or its user
+    is saved (deactivation, password change), see ``accounts.signals``.
+    Nothing is cached unless ``TOKEN_AUTH_CACHE`` is shared between
+    processes (see ``todoapi.caches``).
+    """
+
+    def authenticate_credentials(self, key):
+        if not _use_cache():
+            return super().authenticate_credentials(key)
+
+        cache = _cache()
+        cache_key = _token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is not None:
+            return (token.user, token)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, token, settings.TOKEN_AUTH_CACHE_TIMEOUT)
+        return (user, token)
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate()`` for async views, looking the token up through the
+        async cache and ORM APIs.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _(
+                'Invalid token header. Token string should not contain spaces.'
+            )
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            msg = _(
+                'Invalid token header. Token string should not contain '
+                'invalid characters.'
+            )
+            raise exceptions.AuthenticationFailed(msg)
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        use_cache = _use_cache()
+        cache = _cache()
+        cache_key = _token_cache_key(key)
+        if use_cache:
+            token = await cache.aget(cache_key)
+            if token is not None:
+                return (token.user, token)
+
+        model = self.get_model()
+        try:
+            token = await model.objects.select_related('user').aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        if use_cache:
+            await cache.aset(
+                cache_key, token, settings.TOKEN_AUTH_CACHE_TIMEOUT
+            )
+        return (token.user, token)
+
+
+def _digest(*parts):
+    value = '\0'.join(parts)
+    return salted_hmac(
+        'accounts.authentication.basic', value, algorithm='sha256'
+    ).digest()
+
+
+class VerifiedCredentials:
+    """
+    Bounded, in-process LRU of recently verified Basic credentials.
+
+    Entries map a keyed digest of ``username:password`` to the user's id and
+    a keyed digest of their password hash at the time, so neither the
+    password nor the hash is kept. An entry only counts while that hash is
+    unchanged, which drops it as soon as the password changes.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, password_digest, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user_id, password_digest
+
+    def set(self, key, user_id, password_digest):
+        with self._lock:
+            self._entries[key] = (
+                user_id, password_digest, time.monotonic() + self.timeout
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_credentials = VerifiedCredentials(
+    max_size=settings.BASIC_AUTH_CACHE_SIZE,
+    timeout=settings.BASIC_AUTH_CACHE_TIMEOUT,
+)
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    ``BasicAuthentication`` that skips the password hasher for credentials
+    it verified in the last ``BASIC_AUTH_CACHE_TIMEOUT`` seconds.
+
+    A repeat request costs one primary-key lookup, to check that the user is
+    still active and that their password hash has not changed since.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        if settings.BASIC_AUTH_CACHE_TIMEOUT <= 0:
+            return super().authenticate_credentials(userid, password, request)
+
+        key = _digest(userid, password)
+        entry = verified_credentials.get(key)
+        if entry is not None:
+            user_id, password_digest = entry
+            user = get_user_model()._default_manager.filter(pk=user_id).first()
+            if (
+                user is not None
+                and user.is_active
+                and hmac.compare_digest(_digest(user.password), password_digest)
+            ):
+                return (user, None)
+            verified_credentials.discard(key)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        verified_credentials.set(key, user.pk, _digest(user.password))
+        return (user, auth)
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core import checks
+
+from todoapi.caches import check_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_token_cache(app_configs, **kwargs):
+    if settings.TOKEN_AUTH_CACHE_TIMEOUT <= 0:
+        return []
+    return check_shared(
+        settings.TOKEN_AUTH_CACHE, 'TOKEN_AUTH_CACHE_TIMEOUT', 'accounts.W001'
+    )
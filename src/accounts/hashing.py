@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking work, such as password hashing, that async
+    views can await.
+
+    At most ``max_workers`` jobs run at once and at most ``max_pending`` are
+    accepted in total, running or queued. Past that, ``run()`` raises
+    ``PoolSaturated`` immediately instead of letting the queue grow.
+    """
+
+    def __init__(self, max_workers, max_pending, thread_name_prefix=''):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.thread_name_prefix = thread_name_prefix
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily so that forked worker processes get their own
+        # threads.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=self.thread_name_prefix,
+            )
+        return self._executor
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _call(self, func, args, kwargs):
+        # Pool threads live outside the request cycle, so they clean up
+        # their database connections the way a request would.
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PoolSaturated()
+            self._pending += 1
+            executor = self._get_executor()
+
+        try:
+            future = executor.submit(self._call, func, args, kwargs)
+        except BaseException:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+
+password_hashing = BoundedExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    max_pending=settings.PASSWORD_HASHING_MAX_PENDING,
+    thread_name_prefix='password-hashing',
+)
@@ -0,0 +1,6 @@
+from drf_spectacular.authentication import BasicScheme
+
+
+class CachedBasicScheme(BasicScheme):
+    # BasicScheme does not match subclasses of BasicAuthentication.
+    target_class = 'accounts.authentication.CachedBasicAuthentication'
@@ -1,12 +1,42 @@
+import asyncio
+import base64
+import json
+import tempfile
+import threading
 from typing import cast
+from unittest import mock
 
+from django.core.cache import cache, caches
+from django.test import (
+    AsyncRequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
 from django.urls import reverse
-from rest_framework import status
+from rest_framework import exceptions, status
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.test import APITestCase
 
+from accounts import async_views
+from accounts.authentication import (
+    CachedTokenAuthentication,
+    VerifiedCredentials,
+    verified_credentials,
+)
+from accounts.checks import check_token_cache
+from accounts.hashing import BoundedExecutor, PoolSaturated
 from accounts.models import User
+from todoapi.querycount import query_budget
+
+# Tokens are only cached in a backend shared between workers; a file-based
+# cache stands in for Redis or Memcached.
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(),
+    }
+}
 
 
 class AuthenticationAPITestCase(APITestCase):
@@ -82,3 +112,293 @@ class AuthenticationAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(Token.objects.filter(pk=token.pk).exists())
+
+
+class AuthenticationQueryBudgetTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', password='bar', email='foo@bar.com'
+        )
+
+    def test_signup(self):
+        data = {
+            'username': 'test',
+            'email': 'test@todoapi.com',
+            'password': 'string',
+            'password2': 'string',
+        }
+        with query_budget(3):
+            response = self.client.post(reverse('signup'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login(self):
+        data = {'username': 'foo', 'password': 'bar'}
+        # Includes the savepoint around the token's get_or_create().
+        with query_budget(5):
+            response = self.client.post(reverse('login'), data=data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout(self):
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)  # type: ignore
+
+        with query_budget(2):
+            response = self.client.get(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(CACHES=SHARED_CACHES, TOKEN_AUTH_CACHE_TIMEOUT=300)
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='foo', password='bar', email='foo@bar.com'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)  # type: ignore
+
+    def test_cached_token_needs_no_query(self):
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = authentication.authenticate_credentials(
+                self.token.key
+            )
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_logout_invalidates_cached_token(self):
+        self.assertEqual(
+            self.client.get(reverse('list_todos')).status_code,
+            status.HTTP_200_OK,
+        )
+
+        self.client.get(reverse('logout'))
+
+        response = self.client.get(reverse('list_todos'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates_cached_token(self):
+        self.client.get(reverse('list_todos'))
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse('list_todos'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_no_warning_for_shared_cache(self):
+        self.assertEqual(check_token_cache(None), [])
+
+    @override_settings(TOKEN_AUTH_CACHE_TIMEOUT=0)
+    def test_disabled_cache_is_not_touched(self):
+        self.assertEqual(check_token_cache(None), [])
+        # Saving a user has no cached tokens to forget.
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['email'])
+
+
+# Two in-process caches, like those of two workers.
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'worker1',
+        },
+        'worker2': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'worker2',
+        },
+    },
+    TOKEN_AUTH_CACHE_TIMEOUT=300,
+)
+class PerProcessTokenCacheTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', password='bar', email='foo@bar.com'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_revoked_token_is_refused_by_other_workers(self):
+        authentication = CachedTokenAuthentication()
+        with self.settings(TOKEN_AUTH_CACHE='worker2'):
+            authentication.authenticate_credentials(self.token.key)
+
+        # Logging out through the first worker forgets the token there.
+        self.token.delete()
+
+        with self.settings(TOKEN_AUTH_CACHE='worker2'):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                authentication.authenticate_credentials(self.token.key)
+
+    async def test_async_lookup_is_not_cached(self):
+        authentication = CachedTokenAuthentication()
+        await authentication.aauthenticate_credentials(self.token.key)
+        self.assertFalse(caches['default']._cache)
+
+    def test_warns_about_per_process_cache(self):
+        errors = check_token_cache(None)
+        self.assertEqual([error.id for error in errors], ['accounts.W001'])
+
+
+class CachedBasicAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        verified_credentials.clear()
+        self.user = User.objects.create_user(
+            username='foo', password='bar', email='foo@bar.com'
+        )
+
+    def get_with_basic_auth(self, username, password):
+        credentials = base64.b64encode(f'{username}:{password}'.encode())
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Basic ' + credentials.decode()
+        )  # type: ignore
+        return self.client.get(reverse('list_todos'))
+
+    def test_repeated_requests_skip_password_hashing(self):
+        with mock.patch.object(
+            User, 'check_password', autospec=True,
+            side_effect=User.check_password,
+        ) as check_password:
+            for _ in range(3):
+                response = self.get_with_basic_auth('foo', 'bar')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(check_password.call_count, 1)
+
+    def test_wrong_password_is_not_cached(self):
+        self.get_with_basic_auth('foo', 'bar')
+
+        response = self.get_with_basic_auth('foo', 'not_bar')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        self.get_with_basic_auth('foo', 'bar')
+
+        self.user.set_password('baz')
+        self.user.save()
+
+        response = self.get_with_basic_auth('foo', 'bar')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.get_with_basic_auth('foo', 'baz')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_invalidates(self):
+        self.get_with_basic_auth('foo', 'bar')
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.get_with_basic_auth('foo', 'bar')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cache_is_bounded_and_keeps_no_plaintext(self):
+        credentials = VerifiedCredentials(max_size=2, timeout=60)
+        for key in (b'a', b'b', b'c'):
+            credentials.set(key, 1, b'digest')
+
+        self.assertIsNone(credentials.get(b'a'))
+        self.assertIsNotNone(credentials.get(b'c'))
+
+        self.get_with_basic_auth('foo', 'bar')
+        entries = repr(verified_credentials._entries)
+        self.assertNotIn('bar', entries)
+        self.assertNotIn(self.user.password, entries)
+
+    def test_expired_entries_are_dropped(self):
+        credentials = VerifiedCredentials(max_size=2, timeout=0)
+        credentials.set(b'a', 1, b'digest')
+        self.assertIsNone(credentials.get(b'a'))
+
+
+class AsyncAuthenticationViewsTestCase(TransactionTestCase):
+    # Hashing runs on pool threads with their own database connections,
+    # which cannot see data from an open test transaction.
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user(
+            username='foo', password='bar', email='foo@bar.com'
+        )
+
+    def post(self, view, data):
+        request = self.factory.post(
+            '/', data=data, content_type='application/json'
+        )
+        response = asyncio.run(view(request))
+        return response, json.loads(response.content)
+
+    def test_signup(self):
+        response, data = self.post(async_views.signup, {
+            'username': 'test',
+            'email': 'test@todoapi.com',
+            'password': 'string',
+            'password2': 'string',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(id=data['user_id'])
+        self.assertTrue(user.check_password('string'))
+
+    def test_signup_with_non_matching_password_fields(self):
+        response, _ = self.post(async_views.signup, {
+            'username': 'test',
+            'email': 'test@todoapi.com',
+            'password': 'string',
+            'password2': 'different_string',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_login(self):
+        response, data = self.post(
+            async_views.login, {'username': 'foo', 'password': 'bar'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['user_id'], self.user.pk)
+        self.assertTrue(Token.objects.filter(key=data['token']).exists())
+
+    def test_login_with_incorrect_credentials(self):
+        response, _ = self.post(
+            async_views.login, {'username': 'foo', 'password': 'not_bar'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_when_pool_is_saturated(self):
+        with mock.patch.object(
+            async_views.password_hashing, 'run', side_effect=PoolSaturated
+        ):
+            response, _ = self.post(
+                async_views.login, {'username': 'foo', 'password': 'bar'}
+            )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class BoundedExecutorTestCase(APITestCase):
+    def test_rejects_work_past_max_pending(self):
+        executor = BoundedExecutor(max_workers=1, max_pending=2)
+        release = threading.Event()
+
+        async def scenario():
+            blocked = [
+                asyncio.ensure_future(executor.run(release.wait))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0)
+            with self.assertRaises(PoolSaturated):
+                await executor.run(lambda: None)
+
+            release.set()
+            await asyncio.gather(*blocked)
+            return await executor.run(lambda: 'done')
+
+        self.assertEqual(asyncio.run(scenario()), 'done')
+        self.assertEqual(executor.pending, 0)
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+auth_views = async_views if settings.ACCOUNTS_ASYNC_VIEWS else views
 
 
 urlpatterns = [
-    path('signup/', views.signup, name='signup'),
-    path('auth/login/', views.login, name='login'),
+    path('signup/', auth_views.signup, name='signup'),
+    path('auth/login/', auth_views.login, name='login'),
     path('auth/logout/', views.logout, name='logout'),
 ]
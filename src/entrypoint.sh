@@ -1,14 +1,24 @@
 #!/bin/sh
 
-echo "Running migrations..."
-python manage.py migrate
+# Lets the app report how long the boot took, see todoapi/boot.py.
+export BOOT_STARTED_AT="$(date +%s.%N)"
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
+if [ "$DEBUG" = "True" ] || [ "$DEBUG" = "true" ] || [ "$BOOT_MODE" = "full" ]; then
+    echo "Running migrations..."
+    python manage.py migrate
+
+    echo "Collecting static files..."
+    python manage.py collectstatic --noinput
+else
+    # Gunicorn migrates (unless BOOT_MIGRATE=false) and collects static
+    # files itself, once Django is loaded and only when something changed.
+    # The image ships with its static files collected.
+    export BOOT_PREPARE=true
+fi
 
 echo "Starting server..."
 if [ "$DEBUG" = "True" ] || [ "$DEBUG" = "true" ]; then
     python manage.py runserver 0.0.0.0:8000
 else
-    gunicorn todoapi.wsgi:application --bind 0.0.0.0:8000
+    exec gunicorn --config gunicorn.conf.py
 fi
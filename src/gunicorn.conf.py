@@ -0,0 +1,178 @@
+"""
+Gunicorn configuration, read by ``entrypoint.sh``.
+
+Every setting can be overridden with a ``GUNICORN_*`` environment variable.
+When ``GUNICORN_WORKERS`` is not set, the worker count is derived from the
+CPUs and memory available to the container.
+"""
+
+import os
+
+# Resident memory a worker is expected to need, for sizing the worker count.
+WORKER_MEMORY_MB = int(os.environ.get("GUNICORN_WORKER_MEMORY_MB", "160"))
+# Memory left to the master process and everything else in the container.
+RESERVED_MEMORY_MB = int(os.environ.get("GUNICORN_RESERVED_MEMORY_MB", "128"))
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """CPUs this process may use, honouring affinity and a cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    # cgroup v2: "<quota> <period>", or "max <period>" for no limit.
+    quota = _read("/sys/fs/cgroup/cpu.max")
+    if quota is not None:
+        limit, period = quota.split()
+        if limit != "max":
+            cpus = min(cpus, max(1, int(limit) // int(period)))
+    return cpus
+
+
+def available_memory_mb():
+    """Memory limit of the container's cgroup, or the machine's memory."""
+    for path in (
+        "/sys/fs/cgroup/memory.max",
+        "/sys/fs/cgroup/memory/memory.limit_in_bytes",
+    ):
+        limit = _read(path)
+        # cgroup v1 reports "no limit" as a huge number.
+        if limit and limit != "max" and int(limit) < 1 << 60:
+            return int(limit) // (1024 * 1024)
+    try:
+        pages = os.sysconf("SC_PHYS_PAGES")
+        page_size = os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+    return pages * page_size // (1024 * 1024)
+
+
+def default_workers():
+    workers = 2 * available_cpus() + 1
+    memory = available_memory_mb()
+    if memory is not None:
+        workers = min(
+            workers, (memory - RESERVED_MEMORY_MB) // WORKER_MEMORY_MB
+        )
+    return max(1, workers)
+
+
+wsgi_app = os.environ.get("GUNICORN_APP", "todoapi.wsgi:application")
+bind = os.environ.get(
+    "GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+)
+
+# "sync" or "gthread". An ASGI worker class can be given together with
+# GUNICORN_APP=todoapi.asgi:application.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+workers = int(os.environ.get("GUNICORN_WORKERS", default_workers()))
+threads = int(
+    os.environ.get(
+        "GUNICORN_THREADS", "4" if worker_class == "gthread" else "1"
+    )
+)
+
+# Load the application once in the master, so workers share its memory
+# copy-on-write and a broken deploy fails before any worker starts.
+preload_app = (
+    os.environ.get("GUNICORN_PRELOAD", "True").lower() == "true"
+)
+
+# Recycle workers after this many requests, at staggered times, to bound
+# memory growth without restarting every worker at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(
+    os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "100")
+)
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Worker heartbeats go to tmpfs instead of the container's overlay disk.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG") or None
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+# Migrate and collect static files in the master, only when something
+# changed, before any worker starts (see todoapi.boot). Set by entrypoint.sh
+# unless BOOT_MODE=full.
+BOOT_PREPARE = os.environ.get("BOOT_PREPARE", "False").lower() == "true"
+# Set to false where a release step already migrates, as on Fly.
+BOOT_MIGRATE = os.environ.get("BOOT_MIGRATE", "True").lower() == "true"
+
+_forks = 0
+
+
+def on_starting(server):
+    from todoapi import boot
+
+    # Python and gunicorn, and the application too with preload_app.
+    boot.mark("startup")
+
+
+def when_ready(server):
+    if not BOOT_PREPARE:
+        return
+
+    from todoapi import boot
+
+    if not server.cfg.preload_app:
+        import django
+
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "todoapi.settings")
+        django.setup()
+        boot.mark("django")
+    boot.prepare(log=server.log.info, migrate=BOOT_MIGRATE)
+
+
+def pre_fork(server, worker):
+    # Connections opened in the master, while loading the application or
+    # preparing the boot, must not be inherited by the workers.
+    if server.cfg.preload_app or BOOT_PREPARE:
+        from django.db import connections
+
+        connections.close_all()
+
+    # Only the first generation of workers reports boot timings, not the
+    # ones replacing recycled workers.
+    global _forks
+    _forks += 1
+    worker.reports_boot = _forks <= server.num_workers
+
+
+def post_worker_init(worker):
+    # The post-fork warm-up. Unlike post_fork, this runs once the worker has
+    # loaded the application, which without preload_app happens after the
+    # fork.
+    from todoapi.warmup import warm_up
+
+    from todoapi import boot
+
+    try:
+        warm_up()
+    except Exception:
+        # A worker that cannot warm up still serves requests; the database
+        # may simply not be reachable yet.
+        worker.log.exception("Worker warm-up failed")
+    boot.mark("worker")
+
+
+def post_request(worker, req, environ, resp):
+    if getattr(worker, "reports_boot", False):
+        from todoapi import boot
+
+        worker.reports_boot = False
+        boot.mark("first request")
+        worker.log.info(boot.report())
@@ -2,6 +2,8 @@
 ASGI config for todoapi project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serving through it is required for the Server-Sent Events feed at
+``/todos/events/`` (``todos.async_views.todo_events``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
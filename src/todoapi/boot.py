@@ -0,0 +1,164 @@
+"""
+Boot steps and timings for fast cold starts.
+
+``prepare()`` stands in for running ``migrate`` and ``collectstatic`` on
+every boot. It compares the migrations on disk with the ones recorded as
+applied, and the static files with a fingerprint stored next to their
+collected copies, and only runs a command when something changed.
+
+The image is built with its static files and their fingerprint already
+collected, by running this module (``python -m todoapi.boot``), since
+platforms like Fly start every machine from a fresh copy of the image.
+Collecting at boot is only a fallback for trees where that did not happen.
+
+``mark()`` records when a boot phase finished and ``report()`` breaks the
+time since ``BOOT_STARTED_AT`` (a Unix timestamp set by ``entrypoint.sh``,
+falling back to when this module was imported) down by phase.
+"""
+
+import hashlib
+import os
+import pkgutil
+import time
+from importlib import import_module
+
+STATIC_FINGERPRINT_FILE = '.fingerprint'
+
+STARTED_AT = float(os.environ.get('BOOT_STARTED_AT') or time.time())
+
+_marks = []
+
+
+def mark(phase):
+    """Record that ``phase`` finished now."""
+    _marks.append((phase, time.time()))
+
+
+def report():
+    parts = []
+    previous = STARTED_AT
+    for phase, at in _marks:
+        parts.append(f'{phase} {at - previous:.3f}s')
+        previous = at
+    return f'boot: {", ".join(parts)} (total {previous - STARTED_AT:.3f}s)'
+
+
+def _migrations_on_disk():
+    from django.apps import apps
+    from django.db.migrations.loader import MigrationLoader
+
+    # Listed like MigrationLoader does, without importing every migration.
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            module = import_module(module_name)
+        except ModuleNotFoundError:
+            continue
+        if not hasattr(module, '__path__'):
+            continue
+        found.update(
+            (app_config.label, name)
+            for _, name, is_pkg in pkgutil.iter_modules(module.__path__)
+            if not is_pkg and name[0] not in '_~'
+        )
+    return found
+
+
+def unapplied_migrations(connection):
+    """
+    Return the ``(app_label, name)`` of migrations on disk that the database
+    has not recorded as applied.
+
+    A squashed migration whose replaced migrations are applied counts as
+    unapplied until ``migrate`` records it, which errs on the side of
+    migrating.
+    """
+    from django.db.migrations.recorder import MigrationRecorder
+
+    on_disk = _migrations_on_disk()
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return on_disk
+    return on_disk - set(recorder.applied_migrations())
+
+
+def static_fingerprint():
+    """Digest of the paths and contents of every file collectstatic copies."""
+    from django.contrib.staticfiles import finders
+
+    files = {}
+    for finder in finders.get_finders():
+        # collectstatic's default ignore patterns.
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            prefix = getattr(storage, 'prefix', None)
+            prefixed = os.path.join(prefix, path) if prefix else path
+            # The first finder to find a path wins, as in collectstatic.
+            files.setdefault(prefixed, (storage, path))
+
+    digest = hashlib.sha256()
+    for prefixed in sorted(files):
+        storage, path = files[prefixed]
+        digest.update(prefixed.encode() + b'\0')
+        with storage.open(path) as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _read(path):
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def collect_static(log=print):
+    """
+    Run ``collectstatic`` unless the collected files match the fingerprint
+    of the current ones, and store the new fingerprint.
+    """
+    from django.conf import settings
+    from django.core.management import call_command
+
+    fingerprint = static_fingerprint()
+    fingerprint_path = settings.STATIC_ROOT / STATIC_FINGERPRINT_FILE
+    if _read(fingerprint_path) != fingerprint:
+        log('Static files changed, running collectstatic.')
+        call_command('collectstatic', interactive=False, verbosity=0)
+        fingerprint_path.write_text(fingerprint + '\n')
+
+
+def prepare(log=print, migrate=True):
+    """
+    Migrate and collect static files, each only if something changed.
+
+    With ``migrate=False`` migrations are left to a release step, like
+    ``release_command`` in ``fly.toml``, and the database is not queried.
+    """
+    from django.core.management import call_command
+    from django.db import connection
+
+    if migrate:
+        unapplied = unapplied_migrations(connection)
+        if unapplied:
+            log(f'{len(unapplied)} unapplied migration(s), running migrate.')
+            call_command('migrate', interactive=False, verbosity=0)
+        mark('migrations')
+
+    collect_static(log)
+    mark('static')
+
+
+def main():
+    # Run while building the image, see the Dockerfile.
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todoapi.settings')
+    django.setup()
+    collect_static()
+
+
+if __name__ == '__main__':
+    main()
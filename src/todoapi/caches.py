@@ -0,0 +1,47 @@
+"""
+Which cache backends are shared between worker processes.
+
+Caches that are invalidated by deleting or replacing keys, like the token
+and todo listing caches, are only correct when every worker sees the same
+entries. With a per-process backend, an invalidation made by the worker
+that handled a write never reaches the others, so those caches stay off.
+
+Both are off by default. Enabling one takes a shared backend, such as Redis
+or Memcached, and a non-zero ``TOKEN_AUTH_CACHE_TIMEOUT`` or
+``TODOS_LIST_CACHE_TIMEOUT``; a system check warns when the timeout is set
+but the cache is per-process.
+"""
+
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PER_PROCESS_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared(alias):
+    """Whether every worker process sees the entries of cache ``alias``."""
+    return not isinstance(caches[alias], PER_PROCESS_BACKENDS)
+
+
+def check_shared(alias, setting, id):
+    """
+    A system check warning that the cache enabled by ``setting`` stays off
+    because cache ``alias`` is per-process.
+    """
+    if is_shared(alias):
+        return []
+    backend = type(caches[alias])
+    return [
+        checks.Warning(
+            f'{setting} is ignored: the {alias!r} cache '
+            f'({backend.__module__}.{backend.__qualname__}) is private to '
+            'each process.',
+            hint=(
+                'Configure a shared backend, e.g. '
+                'django.core.cache.backends.redis.RedisCache.'
+            ),
+            id=id,
+        )
+    ]
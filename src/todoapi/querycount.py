@@ -0,0 +1,116 @@
+"""
+Counting and budgeting of SQL queries.
+
+``QueryCounter`` records every query run on a connection through
+``execute_wrapper()``, so it also works with ``DEBUG = False``.
+``QueryCountMiddleware`` reports the totals per request in response headers
+and ``query_budget()`` lets tests fail when an endpoint runs more queries
+than it is allowed to.
+"""
+
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+            self.queries.append(sql)
+
+    def __enter__(self):
+        self._wrapper = connections[self.using].execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+@contextmanager
+def query_budget(limit, using=DEFAULT_DB_ALIAS):
+    """
+    Raise ``QueryBudgetExceeded`` if the block runs more than ``limit``
+    queries, listing the queries that were run.
+    """
+    with QueryCounter(using) as counter:
+        yield counter
+    if counter.count > limit:
+        queries = '\n'.join(
+            f'{number}. {sql}'
+            for number, sql in enumerate(counter.queries, start=1)
+        )
+        raise QueryBudgetExceeded(
+            f'{counter.count} queries run, budget is {limit}:\n{queries}'
+        )
+
+
+class QueryCountMiddleware:
+    """
+    Add ``X-DB-Query-Count`` and ``X-DB-Query-Time`` (in milliseconds) to
+    every response when ``QUERY_COUNT_HEADERS`` is on.
+
+    Queries a streaming response runs while its body is sent are not
+    included.
+
+    Under ASGI the counter is installed on the connection of the thread that
+    runs the request's thread-sensitive code, which is where async ORM calls
+    end up too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.QUERY_COUNT_HEADERS:
+            return self.get_response(request)
+
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        return self._add_headers(response, counter)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_COUNT_HEADERS:
+            return await self.get_response(request)
+
+        counter = QueryCounter()
+        await sync_to_async(counter.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(counter.__exit__)(None, None, None)
+        return self._add_headers(response, counter)
+
+    def _add_headers(self, response, counter):
+        response['X-DB-Query-Count'] = str(counter.count)
+        response['X-DB-Query-Time'] = f'{counter.duration * 1000:.2f}'
+        return response
@@ -0,0 +1,115 @@
+"""
+The OpenAPI schema, built once per process and served from memory.
+
+``SpectacularAPIView`` introspects every view and serializer on each
+request. ``schema_view`` instead serves a schema loaded from
+``OPENAPI_SCHEMA_FILE`` (written at deploy time by
+``manage.py spectacular --file``), or generated on first use when there is
+no such file. Each format is rendered and gzip-compressed once and answered
+with an ETag, so repeat requests are a ``304``.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+import yaml
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.views.decorators.http import require_safe
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+YAML = 'yaml'
+JSON = 'json'
+
+RENDERERS = {
+    YAML: OpenApiYamlRenderer,
+    JSON: OpenApiJsonRenderer,
+}
+
+# Same check as GZipMiddleware.
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+
+class SchemaArtifact:
+    """One rendering of the schema: its body, compressed body and ETag."""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0)
+        self.content_type = content_type
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class CachedSchema:
+    def __init__(self):
+        self._artifacts = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        path = settings.OPENAPI_SCHEMA_FILE
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                return yaml.safe_load(f)
+        return SchemaGenerator().get_schema(request=None, public=True)
+
+    def _build(self):
+        schema = self._load()
+        artifacts = {}
+        for name, renderer_class in RENDERERS.items():
+            renderer = renderer_class()
+            body = renderer.render(schema, renderer_context={})
+            artifacts[name] = SchemaArtifact(
+                body, f'{renderer.media_type}; charset=utf-8'
+            )
+        return artifacts
+
+    def get(self, schema_format=YAML):
+        if self._artifacts is None:
+            with self._lock:
+                if self._artifacts is None:
+                    self._artifacts = self._build()
+        return self._artifacts[schema_format]
+
+    def clear(self):
+        with self._lock:
+            self._artifacts = None
+
+
+cached_schema = CachedSchema()
+
+
+def _get_format(request):
+    schema_format = request.GET.get('format')
+    if schema_format in RENDERERS:
+        return schema_format
+    if 'json' in request.headers.get('Accept', ''):
+        return JSON
+    return YAML
+
+
+@require_safe
+def schema_view(request):
+    artifact = cached_schema.get(_get_format(request))
+
+    response = get_conditional_response(request, etag=artifact.etag)
+    if response is None:
+        response = HttpResponse(content_type=artifact.content_type)
+        if ACCEPTS_GZIP.search(request.headers.get('Accept-Encoding', '')):
+            response.content = artifact.gzipped
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response.content = artifact.body
+
+    response['ETag'] = artifact.etag
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -21,6 +21,12 @@ SECRET_KEY = os.environ.get(
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get("DEBUG", "True").lower() == "true"
 
+# Report the number and time of SQL queries per request in X-DB-Query-*
+# response headers.
+QUERY_COUNT_HEADERS = (
+    os.environ.get("QUERY_COUNT_HEADERS", str(DEBUG)).lower() == "true"
+)
+
 ALLOWED_HOSTS = os.environ.get("ALLOWED_HOSTS", "").split(",")
 if "" in ALLOWED_HOSTS:
     ALLOWED_HOSTS.remove("")
@@ -38,14 +44,18 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'django_extensions',
     'todos',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
 ]
 
+# Development tools, kept out of production boots.
+if DEBUG:
+    INSTALLED_APPS.append('django_extensions')
+
 MIDDLEWARE = [
+    'todoapi.querycount.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -117,6 +127,21 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The default in-process cache is private to each worker, which leaves the
+# token and listing caches off (see todoapi/caches.py).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        'LOCATION': os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
@@ -127,8 +152,8 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',
+        'accounts.authentication.CachedBasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -144,6 +169,78 @@ SPECTACULAR_SETTINGS = {
     # OTHER SETTINGS
 }
 
+# Serve /api/schema/ from a schema built once per process and kept in memory
+# (todoapi.schema) instead of generating it on every request.
+OPENAPI_SCHEMA_CACHE = (
+    os.environ.get("OPENAPI_SCHEMA_CACHE", str(not DEBUG)).lower() == "true"
+)
+# Pre-generated schema to serve, from `manage.py spectacular --file`. When
+# the file does not exist, the schema is generated on first use.
+OPENAPI_SCHEMA_FILE = os.environ.get(
+    "OPENAPI_SCHEMA_FILE", str(BASE_DIR / "schema.yml")
+)
+
 # User Model for Authentication and Authorization
 
 AUTH_USER_MODEL = 'accounts.User'
+
+# Resolved auth tokens are cached for this many seconds; 0, the default,
+# disables it. Needs a shared TOKEN_AUTH_CACHE, see todoapi/caches.py.
+TOKEN_AUTH_CACHE = os.environ.get("TOKEN_AUTH_CACHE", "default")
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.environ.get("TOKEN_AUTH_CACHE_TIMEOUT", "0"))
+
+# Verified HTTP Basic credentials are remembered, per process, for this many
+# seconds; 0 disables it.
+BASIC_AUTH_CACHE_TIMEOUT = int(os.environ.get("BASIC_AUTH_CACHE_TIMEOUT", "60"))
+BASIC_AUTH_CACHE_SIZE = int(os.environ.get("BASIC_AUTH_CACHE_SIZE", "1024"))
+
+# Serve signup/login from async views that hash passwords on a bounded pool
+# (accounts.async_views). Only useful under ASGI.
+ACCOUNTS_ASYNC_VIEWS = (
+    os.environ.get("ACCOUNTS_ASYNC_VIEWS", "False").lower() == "true"
+)
+PASSWORD_HASHING_WORKERS = int(os.environ.get("PASSWORD_HASHING_WORKERS", "2"))
+# Hashing jobs accepted at once, running or queued, before answering 503.
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.environ.get("PASSWORD_HASHING_MAX_PENDING", "16")
+)
+
+# Todos Listing
+
+TODOS_PAGE_SIZE = int(os.environ.get("TODOS_PAGE_SIZE", "50"))
+TODOS_MAX_PAGE_SIZE = int(os.environ.get("TODOS_MAX_PAGE_SIZE", "200"))
+TODOS_STREAM_CHUNK_SIZE = int(os.environ.get("TODOS_STREAM_CHUNK_SIZE", "200"))
+TODOS_MAX_BULK_ITEMS = int(os.environ.get("TODOS_MAX_BULK_ITEMS", "1000"))
+TODOS_IMPORT_BATCH_SIZE = int(os.environ.get("TODOS_IMPORT_BATCH_SIZE", "1000"))
+# Days deletions are kept for /todos/changes/; older change tokens expire.
+TODOS_TOMBSTONE_RETENTION_DAYS = int(
+    os.environ.get("TODOS_TOMBSTONE_RETENTION_DAYS", "30")
+)
+# Seconds each change token reaches back, to cover writes that committed
+# after later ones.
+TODOS_CHANGES_OVERLAP = int(os.environ.get("TODOS_CHANGES_OVERLAP", "5"))
+# Broker behind /todos/events/. todos.events.PostgresBroker reaches the
+# subscribers of every process, InProcessBroker only those of its own.
+TODOS_EVENTS_BROKER = os.environ.get(
+    "TODOS_EVENTS_BROKER", "todos.events.InProcessBroker"
+)
+# Events queued per connection before it is told to resync instead.
+TODOS_EVENTS_QUEUE_SIZE = int(os.environ.get("TODOS_EVENTS_QUEUE_SIZE", "100"))
+# Seconds of silence after which a heartbeat comment is sent.
+TODOS_EVENTS_HEARTBEAT = int(os.environ.get("TODOS_EVENTS_HEARTBEAT", "15"))
+# Serve the todo and item views from async views that use the async ORM
+# (todos.async_views). Only useful under ASGI.
+TODOS_ASYNC_VIEWS = (
+    os.environ.get("TODOS_ASYNC_VIEWS", "False").lower() == "true"
+)
+
+# Todos Caching
+
+TODOS_CACHE = os.environ.get("TODOS_CACHE", "default")
+# Seconds a rendered listing is kept; 0, the default, disables the listing
+# cache. Needs a shared TODOS_CACHE, see todoapi/caches.py.
+TODOS_LIST_CACHE_TIMEOUT = int(os.environ.get("TODOS_LIST_CACHE_TIMEOUT", "0"))
+# Seconds a serialized todo is kept; 0 disables the per-todo fragment cache.
+TODOS_FRAGMENT_CACHE_TIMEOUT = int(
+    os.environ.get("TODOS_FRAGMENT_CACHE_TIMEOUT", "3600")
+)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import (
@@ -6,9 +7,14 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from .schema import schema_view
+
+if not settings.OPENAPI_SCHEMA_CACHE:
+    schema_view = SpectacularAPIView.as_view()
+
 urlpatterns = [
     # Documentation
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', schema_view, name='schema'),
     path(
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='schema'),
@@ -0,0 +1,42 @@
+"""
+Work a fresh process would otherwise do on its first request.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.db import connections
+from django.urls import get_resolver
+from django.utils import translation
+from rest_framework.settings import api_settings
+
+from .schema import cached_schema
+
+
+def warm_up():
+    """
+    Open the database connections and build the lazily filled caches: the
+    URL resolver, DRF's imported settings, the password hashers, the
+    translation catalog and, when it is served from memory, the OpenAPI
+    schema.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+
+    resolver = get_resolver()
+    resolver.reverse_dict  # Imports every URLconf and view module.
+
+    for name in (
+        'DEFAULT_AUTHENTICATION_CLASSES',
+        'DEFAULT_PERMISSION_CLASSES',
+        'DEFAULT_PARSER_CLASSES',
+        'DEFAULT_RENDERER_CLASSES',
+        'DEFAULT_SCHEMA_CLASS',
+    ):
+        getattr(api_settings, name)
+
+    get_hashers()
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+
+    if settings.OPENAPI_SCHEMA_CACHE:
+        cached_schema.get()
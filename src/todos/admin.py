@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.db import transaction
 
-from .models import Todo, TodoItem
+from . import events
+from .cache import invalidate_list
+from .models import COUNTER_FIELDS, Todo, TodoItem, TodoStats, Tombstone
 
 class TodoItemInline(admin.TabularInline):
     model = TodoItem
@@ -10,5 +13,60 @@ class TodoAdmin(admin.ModelAdmin):
     inlines = [
         TodoItemInline
     ]
+    # Kept up to date by the inline items' save() and delete().
+    readonly_fields = ('item_count', 'completed_count')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Reassigning a todo also changes its previous owner's listing.
+        previous_user = form.initial.get('user')
+        if previous_user is not None and previous_user != obj.user_id:
+            # The change view runs in a transaction; the counters are read
+            # under lock, as they are in the database.
+            items, completed = (
+                Todo.objects.select_for_update()
+                .filter(pk=obj.pk)
+                .values_list(*COUNTER_FIELDS)
+                .get()
+            )
+            for user_id, sign in ((previous_user, -1), (obj.user_id, 1)):
+                TodoStats.objects.shift(
+                    user_id,
+                    todos=sign,
+                    items=sign * items,
+                    completed=sign * completed,
+                )
+            Tombstone.objects.record(previous_user, Tombstone.TODO, [obj.pk])
+            events.publish(
+                previous_user, events.TODO, events.DELETED, [obj.pk]
+            )
+            invalidate_list(previous_user)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        # Locked, so that the counters taken off the owners' totals are the
+        # ones deleted.
+        todos = list(
+            queryset.select_for_update().values_list(
+                'user_id', 'pk', *COUNTER_FIELDS
+            )
+        )
+        super().delete_queryset(request, queryset)
+        Tombstone.objects.bulk_create(
+            Tombstone(user_id=user_id, kind=Tombstone.TODO, object_id=pk)
+            for user_id, pk, _, _ in todos
+        )
+        totals = {}
+        for user_id, pk, items, completed in todos:
+            total = totals.setdefault(user_id, [[], 0, 0])
+            total[0].append(pk)
+            total[1] += items
+            total[2] += completed
+        for user_id, (ids, items, completed) in totals.items():
+            events.publish(user_id, events.TODO, events.DELETED, ids)
+            TodoStats.objects.shift(
+                user_id, todos=-len(ids), items=-items, completed=-completed
+            )
+            invalidate_list(user_id)
 
 admin.site.register(Todo, TodoAdmin)
@@ -0,0 +1,382 @@
+"""
+Async versions of the todo and item views for ASGI deployments.
+
+They go through Django's async ORM and cache APIs instead of running the
+whole view on a worker thread, and answer exactly like the views in
+``todos.views``: same payloads, status codes, conditional GETs, listing
+cache and fragments. Selected with ``TODOS_ASYNC_VIEWS``.
+
+Responses are always rendered as JSON. Methods without an async version,
+such as ``OPTIONS``, are handed to the DRF view.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from . import cache, events, views
+from .conditional import (
+    atodo_list_validators,
+    atodo_validators,
+    not_modified,
+    set_validators,
+)
+from .fieldsets import apply_fieldset, get_fieldset
+from .fragments import aserialize_todos
+from .models import Todo, TodoItem, TodoStats
+from .pagination import ItemKeysetPagination, KeysetPagination
+from .rows import render_items, todo_rows
+from .serializers import (
+    TodoItemSerializer,
+    TodoSerializer,
+    TodoStatsSerializer,
+)
+from .streaming import STREAM_FORMATS, astream_todos
+from .views import (
+    _bad_request,
+    _item_miss,
+    _todo_miss,
+    _wants_pagination,
+)
+
+
+async def _authenticate(request):
+    """
+    Authenticate the way ``Request.user`` does, awaiting authenticators that
+    have an ``aauthenticate()`` and running the others on a thread.
+    """
+    for authenticator in request.authenticators:
+        if hasattr(authenticator, 'aauthenticate'):
+            user_auth = await authenticator.aauthenticate(request)
+        else:
+            user_auth = await sync_to_async(authenticator.authenticate)(
+                request
+            )
+        if user_auth is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth
+            return
+    request._not_authenticated()
+
+
+def _handle_exception(request, exc):
+    # Mirrors APIView.handle_exception().
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        authenticators = request.authenticators
+        auth_header = (
+            authenticators[0].authenticate_header(request)
+            if authenticators
+            else None
+        )
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+
+    response = api_settings.EXCEPTION_HANDLER(exc, {'request': request})
+    if response is None:
+        raise exc
+    return response
+
+
+def _render(response):
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = JSONRenderer.media_type
+    response.renderer_context = {}
+    patch_vary_headers(response, ('Accept',))
+    return response.render()
+
+
+def _drf_request(request):
+    return Request(
+        request,
+        parsers=[cls() for cls in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[
+            cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+
+
+def _check_access(sync_view, request, args, kwargs):
+    # The checks APIView.initial() runs after authenticating, with the
+    # permission and throttle classes of the DRF view.
+    view = sync_view.cls(request=request, args=args, kwargs=kwargs)
+    view.check_permissions(request)
+    view.check_throttles(request)
+
+
+def async_api_view(sync_view, methods):
+    """
+    Turn an async function into an API view for ``methods``.
+
+    Like ``@api_view``, the function gets a DRF ``Request`` and may return a
+    DRF ``Response`` or raise API exceptions. Requests are checked against
+    the permissions and throttles of ``sync_view``, on a worker thread since
+    both may use the database or the cache. Any other method is served by
+    ``sync_view``.
+    """
+
+    def decorator(func):
+        @csrf_exempt
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method not in methods:
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+            drf_request = _drf_request(request)
+            try:
+                await _authenticate(drf_request)
+                await sync_to_async(_check_access)(
+                    sync_view, drf_request, args, kwargs
+                )
+                response = await func(drf_request, *args, **kwargs)
+            except Exception as exc:
+                response = _handle_exception(drf_request, exc)
+
+            if isinstance(response, Response):
+                response = _render(response)
+            return response
+
+        return view
+
+    return decorator
+
+
+async def _list_todos(request):
+    fieldset = get_fieldset(request)
+    rows = todo_rows(Todo.objects.filter(user=request.user), fieldset)
+
+    stream_format = request.query_params.get('stream')
+    if stream_format is not None:
+        if stream_format not in STREAM_FORMATS:
+            return _bad_request(
+                {'stream': f'Must be one of: {", ".join(STREAM_FORMATS)}.'}
+            )
+        return astream_todos(rows, stream_format, fieldset)
+
+    if not _wants_pagination(request):
+        data = await aserialize_todos([row async for row in rows], fieldset)
+        return Response(data, status=status.HTTP_200_OK)
+
+    paginator = KeysetPagination()
+    page = await paginator.apaginate_queryset(rows, request)
+    data = await aserialize_todos(page, fieldset)
+    return paginator.get_paginated_response(data)
+
+
+@async_api_view(views.list_todos, ['GET', 'POST'])
+async def list_todos(request):
+    if request.method == 'GET':
+        if 'stream' in request.query_params:
+            validators = await atodo_list_validators(request)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
+            return set_validators(await _list_todos(request), validators)
+
+        cached = await cache.aget_list(request)
+        if cached is not None:
+            validators = cached['validators']
+            response = not_modified(request, validators)
+            if response is None:
+                response = Response(cached['data'], status=status.HTTP_200_OK)
+            response['X-Cache'] = 'HIT'
+            return set_validators(response, validators)
+
+        validators = await atodo_list_validators(request)
+        response = not_modified(request, validators)
+        if response is None:
+            response = await _list_todos(request)
+            if response.status_code == status.HTTP_200_OK:
+                await cache.aset_list(request, response.data, validators)
+        if cache.is_enabled():
+            response['X-Cache'] = 'MISS'
+        return set_validators(response, validators)
+
+    if request.method == 'POST':
+        serializer = TodoSerializer(data=request.data)
+        if not serializer.is_valid():
+            return _bad_request(serializer.errors)
+
+        todo = await Todo.objects.acreate(
+            user=request.user, **serializer.validated_data
+        )
+        return Response(
+            {'message': 'Todo created successfully', 'id': todo.pk},
+            status=status.HTTP_200_OK,
+        )
+
+
+@async_api_view(views.todo, ['GET', 'PUT', 'PATCH', 'DELETE'])
+async def todo(request, id):
+    if request.method == 'PATCH':
+        return await sync_to_async(views._patch_todo)(request, id)
+
+    validators = None
+    if request.method == 'GET':
+        validators = await atodo_validators(request, id)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+
+    fieldset = get_fieldset(request) if request.method == 'GET' else None
+    todos = apply_fieldset(Todo.objects.for_user(request.user), fieldset)
+    todo = await todos.filter(id=id).afirst()
+    if todo is None:
+        return await sync_to_async(_todo_miss)(id)
+
+    if request.method == 'GET':
+        serializer = TodoSerializer(todo, fields=fieldset)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, validators)
+
+    if request.method == 'PUT':
+        serializer = TodoSerializer(todo, data=request.data)
+        if not serializer.is_valid():
+            return _bad_request(serializer.errors)
+
+        for attr, value in serializer.validated_data.items():
+            setattr(todo, attr, value)
+        await todo.asave()
+        return Response(
+            {'message': 'Todo updated successfully'}, status=status.HTTP_200_OK
+        )
+
+    if request.method == 'DELETE':
+        await todo.adelete()
+        return Response(
+            {'message': 'Todo deleted successfully'}, status=status.HTTP_200_OK
+        )
+
+
+@async_api_view(views.create_todo_item, ['GET', 'POST'])
+async def create_todo_item(request, id):
+    if request.method == 'GET':
+        paginator = ItemKeysetPagination()
+        page = await paginator.apaginate_queryset(
+            views._item_rows(request, id), request
+        )
+        if not page:
+            owned = Todo.objects.for_user(request.user).filter(id=id)
+            if not await owned.aexists():
+                return await sync_to_async(_todo_miss)(id)
+        return paginator.get_paginated_response(render_items(page))
+
+    todo = await Todo.objects.for_user(request.user).filter(id=id).afirst()
+    if todo is None:
+        return await sync_to_async(_todo_miss)(id)
+
+    serializer = TodoItemSerializer(data=request.data)
+    if not serializer.is_valid():
+        return _bad_request(serializer.errors)
+
+    await TodoItem.objects.acreate(todo=todo, **serializer.validated_data)
+    return Response(
+        {'message': 'Item created successfully'}, status=status.HTTP_200_OK
+    )
+
+
+@async_api_view(views.todo_item, ['GET', 'PUT', 'PATCH', 'DELETE'])
+async def todo_item(request, id, iid):
+    if request.method == 'PATCH':
+        # One UPDATE plus the counters; nothing to gain from the async ORM.
+        return await sync_to_async(views._patch_todo_item)(request, id, iid)
+
+    items = TodoItem.objects.for_user(request.user, todo_id=id)
+    item = await items.filter(id=iid).afirst()
+    if item is None:
+        return await sync_to_async(_item_miss)(request, id, iid)
+
+    if request.method == 'GET':
+        serializer = TodoItemSerializer(item)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    if request.method == 'PUT':
+        serializer = TodoItemSerializer(item, data=request.data)
+        if not serializer.is_valid():
+            return _bad_request(serializer.errors)
+
+        for attr, value in serializer.validated_data.items():
+            setattr(item, attr, value)
+        await item.asave()
+        return Response(
+            {'message': 'Item updated successfully'}, status=status.HTTP_200_OK
+        )
+
+    if request.method == 'DELETE':
+        await item.adelete()
+        return Response(
+            {'message': 'Item deleted successfully'}, status=status.HTTP_200_OK
+        )
+
+
+@async_api_view(views.todo_stats, ['GET'])
+async def todo_stats(request):
+    stats = await TodoStats.objects.filter(pk=request.user.pk).afirst()
+    if stats is None:
+        stats = await sync_to_async(TodoStats.objects.rebuild)(
+            request.user.pk
+        )
+    serializer = TodoStatsSerializer(stats)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+async def _event_stream(broker, subscription):
+    try:
+        while True:
+            message = await subscription.get(settings.TODOS_EVENTS_HEARTBEAT)
+            # The heartbeat keeps proxies from closing idle connections and
+            # lets the server notice clients that went away.
+            yield events.HEARTBEAT if message is None else message
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@csrf_exempt
+async def todo_events(request):
+    """
+    Stream the user's change events (see ``todos.events``) as Server-Sent
+    Events. Needs ASGI: under WSGI each connection would hold a worker.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    if not isinstance(request, ASGIRequest):
+        return _render(
+            Response(
+                {'error': 'Events are only served under ASGI.'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        )
+
+    drf_request = _drf_request(request)
+    try:
+        await _authenticate(drf_request)
+        user = drf_request.user
+        if not (user and user.is_authenticated):
+            raise exceptions.NotAuthenticated()
+    except Exception as exc:
+        return _render(_handle_exception(drf_request, exc))
+
+    broker = events.get_broker()
+    subscription = broker.subscribe(user.pk)
+    response = StreamingHttpResponse(
+        _event_stream(broker, subscription), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
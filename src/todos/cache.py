@@ -0,0 +1,165 @@
+"""
+Per-user cache of rendered todo listings.
+
+Entries are stored under a per-user version that every write to the user's
+todos or items replaces, so invalidating a user's listings is a single cache
+write regardless of how many query strings were cached for them.
+
+The cache is off unless ``TODOS_CACHE`` is shared between processes, see
+``todoapi.caches``. The hit and miss counters are kept in the same cache,
+where ``manage.py todos_cache_stats`` reads them.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from todoapi.caches import is_shared
+
+HITS_KEY = 'todos:list:hits'
+MISSES_KEY = 'todos:list:misses'
+
+
+def _cache():
+    return caches[settings.TODOS_CACHE]
+
+
+def is_enabled():
+    return settings.TODOS_LIST_CACHE_TIMEOUT > 0 and is_shared(
+        settings.TODOS_CACHE
+    )
+
+
+def _version_key(user_id):
+    return f'todos:list:version:{user_id}'
+
+
+def _get_version(cache, user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(cache, user_id):
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def _versioned_key(request, version):
+    path = hashlib.md5(
+        request.get_full_path().encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'todos:list:{request.user.pk}:{version}:{path}'
+
+
+def _entry_key(cache, request):
+    return _versioned_key(request, _get_version(cache, request.user.pk))
+
+
+async def _aentry_key(cache, request):
+    return _versioned_key(request, await _aget_version(cache, request.user.pk))
+
+
+def _count(cache, key):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); losing one count is fine.
+        pass
+
+
+async def _acount(cache, key):
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        pass
+
+
+def get_list(request):
+    """
+    Return the cached ``{'data', 'validators'}`` entry for this listing
+    request, or ``None`` on a miss.
+    """
+    if not is_enabled():
+        return None
+    cache = _cache()
+    entry = cache.get(_entry_key(cache, request))
+    _count(cache, MISSES_KEY if entry is None else HITS_KEY)
+    return entry
+
+
+def set_list(request, data, validators):
+    if not is_enabled():
+        return
+    cache = _cache()
+    cache.set(
+        _entry_key(cache, request),
+        {'data': data, 'validators': validators},
+        settings.TODOS_LIST_CACHE_TIMEOUT,
+    )
+
+
+async def aget_list(request):
+    if not is_enabled():
+        return None
+    cache = _cache()
+    entry = await cache.aget(await _aentry_key(cache, request))
+    await _acount(cache, MISSES_KEY if entry is None else HITS_KEY)
+    return entry
+
+
+async def aset_list(request, data, validators):
+    if not is_enabled():
+        return
+    cache = _cache()
+    await cache.aset(
+        await _aentry_key(cache, request),
+        {'data': data, 'validators': validators},
+        settings.TODOS_LIST_CACHE_TIMEOUT,
+    )
+
+
+def _bump(user_id):
+    _cache().set(_version_key(user_id), time.time_ns(), None)
+
+
+def invalidate_list(user_id):
+    """
+    Drop every cached listing of ``user_id``.
+
+    The version is replaced right away and again once the surrounding
+    transaction commits, so a listing read and cached before the commit
+    cannot outlive it.
+    """
+    if not is_enabled():
+        return
+    _bump(user_id)
+    transaction.on_commit(lambda: _bump(user_id))
+
+
+def get_stats():
+    cache = _cache()
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
+
+
+def reset_stats():
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,134 @@
+"""
+Delta sync for offline clients.
+
+A change token is an opaque string for how far a client has synced.
+``get_changes()`` returns a user's todos and items written after it, and the
+ids of the ones deleted since, read from ``Tombstone`` rows. Writing an item
+also bumps its todo's ``updated_at``, so changed items are only looked for
+among changed todos, found through the ``(user, updated_at)`` index. A sync
+costs in proportion to what changed, not to the size of the account.
+
+A token holds two timestamps. Its position is the latest ``updated_at`` or
+``deleted_at`` the client was sent, so it only moves with rows that were
+actually read, never with the clock of the worker answering the sync. Writes
+can commit in a different order than their timestamps, so each sync reaches
+``TODOS_CHANGES_OVERLAP`` seconds back from the position; a client may see a
+change twice, and applying changes is idempotent. The other timestamp is
+when the token was issued, after which it expires with the tombstones.
+
+A client has to sync again without ``since`` when it gets a ``410 Gone``:
+its token expired, or the user imported todos since (see ``transfer``).
+Imported todos and items keep their exported timestamps, so an import
+leaves a ``Tombstone.RESET`` instead of showing up as changes.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fieldsets import FIELDS
+from .models import Todo, TodoItem, Tombstone
+from .rows import ITEM_VALUES, render_items, render_todos, todo_rows
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class ChangeTokenError(ValueError):
+    def __init__(self, message, expired=False):
+        super().__init__(message)
+        self.message = message
+        self.expired = expired
+
+
+def _micros(at):
+    return (at - EPOCH) // MICROSECOND
+
+
+def make_token(position, issued=None):
+    """
+    A token for a client that has seen every change up to ``position``,
+    issued at ``issued`` (now by default).
+    """
+    if issued is None:
+        issued = timezone.now()
+    return f'{_micros(position)}.{_micros(issued)}'
+
+
+def parse_token(token):
+    """Return the ``(position, issued)`` of a token from ``make_token()``."""
+    try:
+        position, issued = token.split('.')
+        return (
+            EPOCH + int(position) * MICROSECOND,
+            EPOCH + int(issued) * MICROSECOND,
+        )
+    except (OverflowError, ValueError):
+        raise ChangeTokenError('Invalid change token.')
+
+
+def get_changes(user, token=None):
+    """
+    Return what changed for ``user`` since ``token``, or everything when it
+    is ``None``, with a token to pass next time.
+
+    Raise ``ChangeTokenError`` for a malformed token, one older than the
+    kept tombstones or one from before an import, after which the client
+    has to do a full sync.
+    """
+    now = timezone.now()
+    todos = Todo.objects.filter(user=user)
+    items = TodoItem.objects.filter(todo__user=user)
+    tombstones = Tombstone.objects.filter(user=user)
+    deleted = {Tombstone.TODO: [], Tombstone.ITEM: []}
+
+    if token is None:
+        # Only the latest tombstone, so that the token is past it: a full
+        # sync after an import must not be told to sync in full again.
+        position = tombstones.order_by('-deleted_at').values_list(
+            'deleted_at', flat=True
+        ).first() or EPOCH
+    else:
+        position, issued = parse_token(token)
+        retention = timedelta(days=settings.TODOS_TOMBSTONE_RETENTION_DAYS)
+        if issued < now - retention:
+            raise ChangeTokenError(
+                'The change token has expired, sync again without since.',
+                expired=True,
+            )
+
+        since = position - timedelta(seconds=settings.TODOS_CHANGES_OVERLAP)
+        todos = todos.filter(updated_at__gt=since)
+        items = items.filter(todo__updated_at__gt=since, updated_at__gt=since)
+        rows = tombstones.filter(deleted_at__gt=since).order_by(
+            'deleted_at', 'id'
+        )
+        for kind, object_id, deleted_at in rows.values_list(
+            'kind', 'object_id', 'deleted_at'
+        ):
+            if kind == Tombstone.RESET:
+                if deleted_at > position:
+                    raise ChangeTokenError(
+                        'Todos were imported since the change token, sync '
+                        'again without since.',
+                        expired=True,
+                    )
+            else:
+                deleted[kind].append(object_id)
+            position = max(position, deleted_at)
+
+    todo_list = list(todo_rows(todos.order_by('updated_at', 'id'), FIELDS))
+    item_list = list(items.order_by('id').values(*ITEM_VALUES))
+    for row in (*todo_list, *item_list):
+        position = max(position, row['updated_at'])
+
+    return {
+        'todos': render_todos(todo_list, FIELDS),
+        'items': render_items(item_list),
+        'deleted': {
+            'todos': deleted[Tombstone.TODO],
+            'items': deleted[Tombstone.ITEM],
+        },
+        'token': make_token(position, now),
+    }
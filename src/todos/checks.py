@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core import checks
+
+from todoapi.caches import check_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_list_cache(app_configs, **kwargs):
+    if settings.TODOS_LIST_CACHE_TIMEOUT <= 0:
+        return []
+    return check_shared(
+        settings.TODOS_CACHE, 'TODOS_LIST_CACHE_TIMEOUT', 'todos.W001'
+    )
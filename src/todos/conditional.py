@@ -0,0 +1,113 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Todo
+
+
+def _etag(*parts):
+    digest = hashlib.md5(
+        '|'.join(str(part) for part in parts).encode(), usedforsecurity=False
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+def _list_stats_kwargs():
+    return {'count': Count('id'), 'last_modified': Max('updated_at')}
+
+
+def _list_validators(request, stats):
+    etag = _etag(
+        request.user.pk,
+        stats['count'],
+        stats['last_modified'] and stats['last_modified'].isoformat(),
+        request.get_full_path(),
+    )
+    return etag, None
+
+
+def todo_list_validators(request):
+    """
+    Return ``(etag, None)`` for the user's todo listing.
+
+    Item writes bump their todo's ``updated_at``, and deleting a todo changes
+    the count, so one aggregate over the user's todos covers every change.
+    The query string is part of the ETag since it selects what is rendered.
+
+    Listings have no ``Last-Modified``: deleting any todo but the newest
+    leaves the latest ``updated_at`` where it was, so ``If-Modified-Since``
+    alone would answer 304 with the deleted todo still listed.
+    """
+    stats = Todo.objects.filter(user=request.user).aggregate(
+        **_list_stats_kwargs()
+    )
+    return _list_validators(request, stats)
+
+
+async def atodo_list_validators(request):
+    stats = await Todo.objects.filter(user=request.user).aaggregate(
+        **_list_stats_kwargs()
+    )
+    return _list_validators(request, stats)
+
+
+def _todo_row(todo_id):
+    return Todo.objects.filter(id=todo_id).values_list('user_id', 'updated_at')
+
+
+def _todo_validators(request, todo_id, row):
+    if row is None or row[0] != request.user.pk:
+        return None
+
+    updated_at = row[1]
+    etag = _etag(todo_id, updated_at.isoformat(), request.get_full_path())
+    return etag, updated_at
+
+
+def todo_validators(request, todo_id):
+    """
+    Return ``(etag, last_modified)`` for a single todo, or ``None`` when it
+    does not exist or belongs to someone else, leaving those responses to
+    the view.
+    """
+    return _todo_validators(request, todo_id, _todo_row(todo_id).first())
+
+
+async def atodo_validators(request, todo_id):
+    row = await _todo_row(todo_id).afirst()
+    return _todo_validators(request, todo_id, row)
+
+
+def not_modified(request, validators):
+    """
+    Return a ``304 Not Modified`` response if the request's
+    ``If-None-Match``/``If-Modified-Since`` headers match, otherwise ``None``.
+    """
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is not None:
+        _add_headers(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, validators):
+    """Add the validators to a successful response."""
+    if validators is not None and 200 <= response.status_code < 300:
+        _add_headers(response, *validators)
+    return response
+
+
+def _add_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Clients may keep the response but have to revalidate it every time.
+    patch_cache_control(response, private=True, no_cache=True)
@@ -0,0 +1,252 @@
+"""
+Per-user change events, streamed to clients as Server-Sent Events.
+
+The write paths call ``publish()``, which hands the event to the broker set
+in ``TODOS_EVENTS_BROKER`` once the surrounding transaction commits. A
+subscriber (one ``/todos/events/`` connection, see
+``async_views.todo_events``) gets every event of its user in order.
+
+Events are small: what kind of object changed, how, and its ids. Clients
+fetch the changes themselves from ``/todos/changes/``, with the token of
+their last sync there: changes made before a client subscribed or while it
+was reconnecting were never sent as events, so a client syncs once
+connected and then whenever an event comes. A ``resync`` event means events
+were lost, e.g. because the connection fell behind, and the client should
+sync the same way.
+
+``InProcessBroker`` only reaches subscribers in the publishing process.
+``PostgresBroker`` relays events through Postgres ``LISTEN``/``NOTIFY`` so
+that every ASGI worker sees the writes of every other worker.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TODO = 'todo'
+ITEM = 'item'
+RESYNC = 'resync'
+
+SAVED = 'saved'
+DELETED = 'deleted'
+
+HEARTBEAT = b': heartbeat\n\n'
+
+
+def encode(event):
+    """Format ``event`` as an SSE message."""
+    data = json.dumps(event, separators=(',', ':'))
+    return f'event: {event["type"]}\ndata: {data}\n\n'.encode()
+
+
+def _resync_message():
+    return encode({'type': RESYNC})
+
+
+class Subscription:
+    """
+    One connection's queue of encoded events, bounded by ``max_size``.
+
+    A connection that falls that far behind loses its queued events and
+    gets a single ``resync`` event instead, so a slow client costs at most
+    ``max_size`` messages of memory.
+    """
+
+    __slots__ = ('user_id', 'max_size', '_loop', '_messages', '_waiter')
+
+    def __init__(self, user_id, max_size, loop):
+        self.user_id = user_id
+        self.max_size = max_size
+        self._loop = loop
+        self._messages = deque()
+        self._waiter = None
+
+    def _put(self, message):
+        if len(self._messages) >= self.max_size:
+            self._messages.clear()
+            message = _resync_message()
+        self._messages.append(message)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def put(self, message):
+        """Queue ``message``; safe to call from any thread."""
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            pass  # The connection's event loop is closed.
+
+    async def get(self, timeout=None):
+        """
+        Return the next message, or ``None`` if none came within
+        ``timeout`` seconds.
+        """
+        if not self._messages:
+            self._waiter = self._loop.create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                self._waiter = None
+        return self._messages.popleft()
+
+
+class InProcessBroker:
+    """Delivers events to the subscribers of the current process."""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Subscribe to ``user_id``'s events, from a running event loop."""
+        subscription = Subscription(
+            user_id,
+            settings.TODOS_EVENTS_QUEUE_SIZE,
+            asyncio.get_running_loop(),
+        )
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscriptions.get(user_id, ()))
+            return sum(map(len, self._subscriptions.values()))
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscriptions = tuple(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def deliver_all(self, message):
+        with self._lock:
+            subscriptions = [
+                subscription
+                for subscriptions in self._subscriptions.values()
+                for subscription in subscriptions
+            ]
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def publish(self, user_id, event):
+        """Send ``event`` to ``user_id``'s subscribers; any thread."""
+        # Most writes have nobody listening, and then need no encoding.
+        if self.subscriber_count(user_id):
+            self.deliver(user_id, encode(event))
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Relays events through Postgres ``NOTIFY`` on ``CHANNEL``.
+
+    Each process listens on one dedicated connection, opened with the first
+    subscription, and delivers what it hears to its own subscribers.
+    Subscribers get a ``resync`` when that connection is re-established,
+    since notifications sent in between are lost.
+    """
+
+    CHANNEL = 'todos_events'
+    # Postgres rejects larger payloads.
+    MAX_PAYLOAD = 7900
+    RECONNECT_DELAY = 1
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, user_id, event):
+        payload = json.dumps(
+            {'user': user_id, 'event': event}, separators=(',', ':')
+        )
+        if len(payload) > self.MAX_PAYLOAD:
+            payload = json.dumps({'user': user_id, 'event': {'type': RESYNC}})
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.CHANNEL, payload])
+
+    def subscribe(self, user_id):
+        subscription = super().subscribe(user_id)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(
+                self._listen()
+            )
+        return subscription
+
+    def _conninfo(self):
+        database = settings.DATABASES['default']
+        options = {
+            'dbname': database['NAME'],
+            'user': database.get('USER'),
+            'password': database.get('PASSWORD'),
+            'host': database.get('HOST'),
+            'port': database.get('PORT'),
+        }
+        return {name: value for name, value in options.items() if value}
+
+    async def _listen(self):
+        import psycopg
+
+        first = True
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    autocommit=True, **self._conninfo()
+                ) as listener:
+                    await listener.execute(f'LISTEN {self.CHANNEL}')
+                    if not first:
+                        self.deliver_all(_resync_message())
+                    first = False
+                    async for notify in listener.notifies():
+                        message = json.loads(notify.payload)
+                        if self.subscriber_count(message['user']):
+                            self.deliver(
+                                message['user'], encode(message['event'])
+                            )
+            except psycopg.Error:
+                logger.exception('Lost the todo events connection.')
+                first = False
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.TODOS_EVENTS_BROKER)()
+    return _broker
+
+
+def publish(user_id, kind, action=None, ids=(), **extra):
+    """
+    Publish an event for ``user_id`` once the current transaction commits,
+    e.g. ``publish(1, ITEM, DELETED, [5, 6], todo=2)`` or
+    ``publish(1, RESYNC)``.
+    """
+    event = {'type': kind}
+    if action is not None:
+        event.update(action=action, ids=list(ids), **extra)
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
@@ -0,0 +1,61 @@
+from rest_framework.exceptions import ValidationError
+
+from .serializers import TodoSerializer
+
+RELATIONS = ('items',)
+FIELDS = tuple(
+    name for name in TodoSerializer.Meta.fields if name not in RELATIONS
+)
+
+# Columns the views need regardless of what the client asked for: the
+# primary key, the owner for the access check and the pagination key.
+REQUIRED_COLUMNS = ('id', 'user', 'updated_at')
+
+
+def _parse_list(value, allowed, param):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise ValidationError(
+            {param: f'Unknown field(s): {", ".join(unknown)}.'}
+        )
+    return names
+
+
+def get_fieldset(request):
+    """
+    Return the ``TodoSerializer`` fields selected by ``?fields=`` and
+    ``?include=``, or ``None`` when the client asked for the full
+    representation.
+    """
+    fields = request.query_params.get('fields')
+    include = request.query_params.get('include')
+    if fields is None and include is None:
+        return None
+
+    if fields is None:
+        selected = list(FIELDS)
+    else:
+        selected = _parse_list(fields, FIELDS + RELATIONS, 'fields')
+    if include is not None:
+        selected += _parse_list(include, RELATIONS, 'include')
+    return tuple(dict.fromkeys(selected))
+
+
+def includes_items(fieldset):
+    return fieldset is None or 'items' in fieldset
+
+
+def apply_fieldset(queryset, fieldset, prefetch=True):
+    """
+    Restrict the columns loaded for a todo queryset to the ones needed to
+    render ``fieldset``, and only prefetch items when they were asked for.
+    """
+    if fieldset is not None:
+        columns = [name for name in fieldset if name in FIELDS]
+        queryset = queryset.only(
+            *dict.fromkeys(REQUIRED_COLUMNS + tuple(columns))
+        )
+    if prefetch and includes_items(fieldset):
+        queryset = queryset.prefetch_related('items')
+    return queryset
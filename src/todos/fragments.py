@@ -0,0 +1,88 @@
+"""
+Cache of serialized todos, one fragment per todo.
+
+A fragment is keyed by the todo's id and ``updated_at``. Item writes bump
+their todo's ``updated_at`` too, so a changed todo simply misses and stale
+fragments are never read again; they just expire.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .rows import aserialize_rows, serialize_rows
+
+
+def _cache():
+    return caches[settings.TODOS_CACHE]
+
+
+def is_enabled():
+    return settings.TODOS_FRAGMENT_CACHE_TIMEOUT > 0
+
+
+def _fieldset_key(fieldset):
+    if fieldset is None:
+        return 'all'
+    return hashlib.md5(
+        ','.join(fieldset).encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def _key(row, fieldset_key):
+    return (
+        f'todos:fragment:{row["id"]}:{row["updated_at"].timestamp():.6f}:'
+        f'{fieldset_key}'
+    )
+
+
+def _fragments(rows, data, fieldset_key):
+    return {_key(row, fieldset_key): todo for row, todo in zip(rows, data)}
+
+
+def serialize_todos(rows, fieldset=None):
+    """
+    Return the representation of todo rows from ``rows.todo_rows()``, built
+    from cached fragments where possible.
+
+    Items are only loaded, in one query, for the todos whose fragment was
+    missing.
+    """
+    rows = list(rows)
+    if not is_enabled():
+        return serialize_rows(rows, fieldset)
+
+    cache = _cache()
+    fieldset_key = _fieldset_key(fieldset)
+    keys = [_key(row, fieldset_key) for row in rows]
+    fragments = cache.get_many(keys)
+
+    stale = [row for row, key in zip(rows, keys) if key not in fragments]
+    if stale:
+        data = serialize_rows(stale, fieldset)
+        fresh = _fragments(stale, data, fieldset_key)
+        cache.set_many(fresh, settings.TODOS_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(fresh)
+
+    return [fragments[key] for key in keys]
+
+
+async def aserialize_todos(rows, fieldset=None):
+    """Async ``serialize_todos()`` for a list of rows."""
+    if not is_enabled():
+        return await aserialize_rows(rows, fieldset)
+
+    cache = _cache()
+    fieldset_key = _fieldset_key(fieldset)
+    keys = [_key(row, fieldset_key) for row in rows]
+    fragments = await cache.aget_many(keys)
+
+    stale = [row for row, key in zip(rows, keys) if key not in fragments]
+    if stale:
+        data = await aserialize_rows(stale, fieldset)
+        fresh = _fragments(stale, data, fieldset_key)
+        await cache.aset_many(fresh, settings.TODOS_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(fresh)
+
+    return [fragments[key] for key in keys]
@@ -0,0 +1,99 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from todos.models import Todo, TodoItem
+from todos.rows import serialize_rows, todo_rows
+from todos.serializers import TodoSerializer
+
+
+def _best_of(repeat, func):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = (
+        'Time rendering a full todo listing with TodoSerializer and with the '
+        'values() fast path, for several numbers of items. The data is '
+        'created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items',
+            type=int,
+            nargs='+',
+            default=[10, 1000, 100000],
+            help='Item counts to benchmark.',
+        )
+        parser.add_argument('--items-per-todo', type=int, default=10)
+        parser.add_argument(
+            '--repeat', type=int, default=3, help='Runs per path; best counts.'
+        )
+
+    def create_data(self, count, items_per_todo):
+        user = get_user_model().objects.create_user(
+            username=f'benchmark-serializers-{count}',
+            email=f'benchmark-serializers-{count}@example.com',
+        )
+        todos = Todo.objects.bulk_create(
+            Todo(name=f'todo {i}', description='lorem ipsum', user=user)
+            for i in range(max(1, -(-count // items_per_todo)))
+        )
+        TodoItem.objects.bulk_create(
+            (
+                TodoItem(
+                    name=f'item {i}',
+                    todo=todos[i // items_per_todo],
+                    is_complete=i % 3 == 0,
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+        return Todo.objects.filter(user=user).order_by('id'), len(todos)
+
+    def handle(self, *args, **options):
+        if options['items_per_todo'] < 1:
+            raise CommandError('--items-per-todo must be at least 1.')
+
+        renderer = JSONRenderer()
+        self.stdout.write(
+            f'{"items":>8} {"todos":>7} {"serializer ms":>14} '
+            f'{"fast path ms":>13} {"speedup":>8}'
+        )
+        with transaction.atomic():
+            for count in options['items']:
+                todos, todo_count = self.create_data(
+                    count, options['items_per_todo']
+                )
+
+                def serializer():
+                    queryset = todos.prefetch_related('items')
+                    return TodoSerializer(queryset, many=True).data
+
+                def fast_path():
+                    return serialize_rows(todo_rows(todos))
+
+                slow, expected = _best_of(options['repeat'], serializer)
+                fast, data = _best_of(options['repeat'], fast_path)
+                if renderer.render(data) != renderer.render(expected):
+                    raise CommandError(
+                        f'The fast path output differs at {count} items.'
+                    )
+
+                self.stdout.write(
+                    f'{count:>8} {todo_count:>7} {slow * 1000:>14.1f} '
+                    f'{fast * 1000:>13.1f} {slow / fast:>7.1f}x'
+                )
+            transaction.set_rollback(True)
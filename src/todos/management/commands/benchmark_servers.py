@@ -0,0 +1,224 @@
+import http.client
+import importlib.util
+import os
+import shlex
+import statistics
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from todos.models import Todo
+
+SERVERS = {
+    # The DRF views on gunicorn's sync worker, or gthread with --threads.
+    'wsgi': (
+        'gunicorn todoapi.wsgi:application --bind {bind} '
+        '--workers {workers} --threads {threads}',
+        {},
+    ),
+    # The async views on an ASGI worker.
+    'asgi': (
+        'gunicorn todoapi.asgi:application --bind {bind} '
+        '--workers {workers} --worker-class uvicorn_worker.UvicornWorker',
+        {'TODOS_ASYNC_VIEWS': 'true', 'ACCOUNTS_ASYNC_VIEWS': 'true'},
+    ),
+}
+
+# Packages the default command lines need that are not dependencies of the
+# project, by module and package name.
+REQUIREMENTS = {'asgi': ('uvicorn_worker', 'uvicorn-worker')}
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, latency, ok):
+        with self._lock:
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+
+
+def _client(host, port, paths, headers, deadline, result):
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    n = 0
+    while time.monotonic() < deadline:
+        path = paths[n % len(paths)]
+        n += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            ok = False
+        result.add(time.perf_counter() - start, ok)
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Start the API under gunicorn over WSGI and over ASGI in turn and '
+        'compare how many concurrent requests per second each one serves.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'username', help='User whose todos the requests read.'
+        )
+        parser.add_argument(
+            '--server',
+            action='append',
+            choices=sorted(SERVERS),
+            help='Server to benchmark; repeat for several. Defaults to all.',
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--duration', type=float, default=10, help='Seconds per server.'
+        )
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument(
+            '--threads', type=int, default=1, help='Threads per WSGI worker.'
+        )
+        parser.add_argument('--port', type=int, default=8100)
+        for name in SERVERS:
+            parser.add_argument(
+                f'--{name}-command',
+                help=f'Command line that starts the {name} server.',
+            )
+
+    def get_paths(self, user):
+        todo = Todo.objects.filter(user=user).first()
+        if todo is None:
+            raise CommandError(f'{user} has no todos to request.')
+        # The listing cache would make every server look the same.
+        return [
+            reverse('list_todos') + '?paginate=false',
+            reverse('todo', kwargs={'id': todo.pk}),
+        ]
+
+    def check_requirements(self, name, options):
+        if options[f'{name}_command'] or name not in REQUIREMENTS:
+            return
+        module, package = REQUIREMENTS[name]
+        if importlib.util.find_spec(module) is None:
+            raise CommandError(
+                f'The {name} server needs the {package} package: install it '
+                f'with "pip install {package}", or pass --{name}-command.'
+            )
+
+    def start(self, name, options):
+        template, extra_env = SERVERS[name]
+        command = options[f'{name}_command'] or template
+        command = command.format(
+            bind=f'127.0.0.1:{options["port"]}',
+            workers=options['workers'],
+            threads=options['threads'],
+        )
+        env = {
+            **os.environ,
+            **extra_env,
+            'TODOS_LIST_CACHE_TIMEOUT': '0',
+            'QUERY_COUNT_HEADERS': 'false',
+        }
+        try:
+            return subprocess.Popen(
+                shlex.split(command),
+                cwd=settings.BASE_DIR,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError as exc:
+            raise CommandError(f'Cannot start {name} server: {exc}')
+
+    def wait_until_ready(self, name, process, port, path, headers):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                stderr = process.stderr.read().decode(errors='replace')
+                raise CommandError(f'{name} server exited:\n{stderr}')
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            try:
+                connection.request('GET', path, headers=headers)
+                connection.getresponse().read()
+                return
+            except OSError:
+                time.sleep(0.2)
+            finally:
+                connection.close()
+        raise CommandError(f'{name} server did not start within 30 seconds.')
+
+    def run_load(self, port, paths, headers, options):
+        result = LoadResult()
+        deadline = time.monotonic() + options['duration']
+        threads = [
+            threading.Thread(
+                target=_client,
+                args=('127.0.0.1', port, paths, headers, deadline, result),
+            )
+            for _ in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, duration):
+        latencies = sorted(result.latencies)
+        if not latencies:
+            self.stdout.write(f'{name:<6} no requests completed')
+            return
+        percentiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{name:<6} {len(latencies):>9} {result.errors:>7} '
+            f'{len(latencies) / duration:>9.1f} '
+            f'{percentiles[49] * 1000:>8.1f} {percentiles[98] * 1000:>8.1f}'
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': f'Token {token.key}'}
+        paths = self.get_paths(user)
+        port = options['port']
+        servers = options['server'] or SERVERS
+        # Before any server is started, so that a run does not stop halfway.
+        for name in servers:
+            self.check_requirements(name, options)
+
+        self.stdout.write(
+            f'{options["concurrency"]} clients, {options["duration"]:g}s per '
+            f'server, {options["workers"]} worker(s)'
+        )
+        self.stdout.write(
+            f'{"server":<6} {"requests":>9} {"errors":>7} {"req/s":>9} '
+            f'{"p50 ms":>8} {"p99 ms":>8}'
+        )
+        for name in servers:
+            process = self.start(name, options)
+            try:
+                self.wait_until_ready(name, process, port, paths[0], headers)
+                result = self.run_load(port, paths, headers, options)
+            finally:
+                process.terminate()
+                process.wait()
+            self.report(name, result, options['duration'])
@@ -0,0 +1,120 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from todos import views
+from todos.changes import make_token
+from todos.models import Todo, TodoItem
+from todos.pagination import NEXT, encode_id_cursor
+
+# A plan line that reads a whole todos table instead of an index range.
+FULL_SCAN = re.compile(r'Seq Scan on todos_|\bSCAN todos_\w+$', re.MULTILINE)
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the EXPLAIN plan of every query the todo views run for a "
+        "user's data. With --check, fail if any of them scans a todos table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Exit with an error if a plan contains a full table scan.',
+        )
+
+    def get_requests(self, user):
+        todo = Todo.objects.filter(user=user).first()
+        if todo is None:
+            raise CommandError(f'{user} has no todos to explain queries for.')
+
+        items_path = reverse('create_todo_item', kwargs={'id': todo.pk})
+        requests = [
+            ('list_todos', reverse('list_todos'), {}),
+            ('list_todos', reverse('list_todos'), {'page_size': 1}),
+            ('list_todos', reverse('list_todos'), {'fields': 'id,name'}),
+            ('todo', reverse('todo', kwargs={'id': todo.pk}), {}),
+            ('create_todo_item', items_path, {'is_complete': 'false'}),
+            # Changes since the user's first todo: todos, their items and
+            # tombstones after a point in time.
+            (
+                'todo_changes',
+                reverse('todo_changes'),
+                {'since': make_token(todo.updated_at)},
+            ),
+        ]
+
+        item = TodoItem.objects.filter(todo=todo).first()
+        if item is not None:
+            requests.append((
+                'todo_item',
+                reverse('todo_item', kwargs={'id': todo.pk, 'iid': item.pk}),
+                {},
+            ))
+            # A later keyset page of the todo's items.
+            requests.append((
+                'create_todo_item',
+                items_path,
+                {'cursor': encode_id_cursor(item.pk, False, NEXT)},
+            ))
+        return requests
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            # The plan text is the last column on every supported backend.
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        factory = APIRequestFactory()
+        full_scans = 0
+
+        # Caches would hide the queries, and on small tables Postgres
+        # prefers sequential scans even where a usable index exists.
+        with override_settings(
+            TODOS_LIST_CACHE_TIMEOUT=0, TODOS_FRAGMENT_CACHE_TIMEOUT=0
+        ), transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, path, params in self.get_requests(user):
+                request = factory.get(path, params)
+                force_authenticate(request, user=user)
+                match = resolve(path)
+
+                # The DRF views, even when TODOS_ASYNC_VIEWS routes to the
+                # async ones; both run the same queries.
+                with CaptureQueriesContext(connection) as queries:
+                    getattr(views, name)(request, **match.kwargs)
+
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{name}: GET {request.get_full_path()}'
+                ))
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith('SELECT'):
+                        continue
+                    plan = self.explain(sql)
+                    self.stdout.write(f'  {sql}')
+                    for line in plan.splitlines():
+                        self.stdout.write(f'    {line}')
+                    if FULL_SCAN.search(plan):
+                        full_scans += 1
+                        self.stdout.write(self.style.WARNING('    ^ full scan'))
+
+        if options['check'] and full_scans:
+            raise CommandError(f'{full_scans} query plan(s) use a full scan.')
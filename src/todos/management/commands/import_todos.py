@@ -0,0 +1,45 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from todos.transfer import NDJSONImportError, import_ndjson
+
+
+class Command(BaseCommand):
+    help = "Import NDJSON todos and items, as written by export_todos, for a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='File to read from. Defaults to stdin.',
+        )
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        try:
+            if options['input'] == '-':
+                counts = import_ndjson(
+                    user, sys.stdin.buffer, batch_size=options['batch_size']
+                )
+            else:
+                # Bytes, so that import_ndjson() reports undecodable lines.
+                with open(options['input'], 'rb') as lines:
+                    counts = import_ndjson(
+                        user, lines, batch_size=options['batch_size']
+                    )
+        except NDJSONImportError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {counts['todos']} todos and {counts['items']} items."
+            )
+        )
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from todos.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete tombstones older than TODOS_TOMBSTONE_RETENTION_DAYS, in '
+        'batches. Change tokens from before then have already expired.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        cutoff = timezone.now() - timedelta(
+            days=settings.TODOS_TOMBSTONE_RETENTION_DAYS
+        )
+        expired = Tombstone.objects.filter(deleted_at__lt=cutoff)
+
+        pruned = 0
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            pruned += Tombstone.objects.filter(pk__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned {pruned} tombstones.'))
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from todos.models import STATS_FIELDS, TodoStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every user's todo stats from their todos and items, in "
+        'batches of users.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*', help='Only rebuild these users.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        users = get_user_model().objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                users.filter(pk__gt=last_pk).values_list('pk', flat=True)[
+                    :batch_size
+                ]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+
+            TodoStats.objects.bulk_create(
+                TodoStats.objects.totals(ids).values(),
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=STATS_FIELDS,
+            )
+            rebuilt += len(ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt the stats of {rebuilt} users.')
+        )
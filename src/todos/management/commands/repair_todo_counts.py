@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from todos import events
+from todos.cache import invalidate_list
+from todos.models import Todo, TodoStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every todo's item_count and completed_count from its "
+        'items, in batches of todos, fixing the ones that drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many todos have wrong counters.',
+        )
+
+    def drifted(self, ids):
+        return (
+            Todo.objects.filter(pk__in=ids)
+            .annotate(
+                actual_items=Count('items'),
+                actual_completed=Count(
+                    'items', filter=Q(items__is_complete=True)
+                ),
+            )
+            .exclude(
+                item_count=F('actual_items'),
+                completed_count=F('actual_completed'),
+            )
+            .values_list('pk', 'user_id')
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        checked = fixed = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                Todo.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            checked += len(ids)
+
+            with transaction.atomic():
+                drifted = dict(self.drifted(ids))
+                if drifted and not options['dry_run']:
+                    todos = Todo.objects.filter(pk__in=drifted)
+                    todos.recount()
+                    # The representation changed: new validators and
+                    # fragment cache keys.
+                    todos.touch()
+                    # Their owners' totals drifted along with them.
+                    repaired = {}
+                    for pk, user_id in drifted.items():
+                        repaired.setdefault(user_id, []).append(pk)
+                    for user_id, ids in repaired.items():
+                        TodoStats.objects.rebuild(user_id)
+                        events.publish(user_id, events.TODO, events.SAVED, ids)
+                        invalidate_list(user_id)
+            fixed += len(drifted)
+
+        verb = 'have wrong counters' if options['dry_run'] else 'repaired'
+        self.stdout.write(
+            self.style.SUCCESS(f'{fixed} of {checked} todos {verb}.')
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from todos.cache import get_stats, is_enabled, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters of the todo listing cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Reset the counters to zero.'
+        )
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            self.stdout.write(
+                self.style.WARNING(
+                    'The listing cache is disabled: TODOS_LIST_CACHE_TIMEOUT '
+                    'is 0 or TODOS_CACHE is not shared between processes.'
+                )
+            )
+
+        stats = get_stats()
+        ratio = stats['hit_ratio']
+        self.stdout.write(f"hits: {stats['hits']}")
+        self.stdout.write(f"misses: {stats['misses']}")
+        self.stdout.write(
+            f"hit ratio: {'n/a' if ratio is None else f'{ratio:.1%}'}"
+        )
+
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
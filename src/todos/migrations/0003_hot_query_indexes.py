@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-18 01:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    Build the index without blocking writes to the table on Postgres, like
+    ``django.contrib.postgres.operations.AddIndexConcurrently``, and as a
+    plain ``AddIndex`` on other databases (SQLite in development and tests).
+    """
+
+    def database_forwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(
+        self, app_label, schema_editor, from_state, to_state
+    ):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('todos', '0002_rename_update_at_todo_updated_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='todos_todo_user_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='todoitem',
+            index=models.Index(fields=['todo', 'is_complete', 'id'], name='todos_item_todo_complete_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='todoitem',
+            index=models.Index(condition=models.Q(('is_complete', False)), fields=['todo', 'id'], name='todos_item_open_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-18 02:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_items(apps, schema_editor):
+    Todo = apps.get_model('todos', 'Todo')
+    TodoItem = apps.get_model('todos', 'TodoItem')
+
+    items = TodoItem.objects.filter(todo=OuterRef('pk')).order_by().values('todo')
+
+    def count(items):
+        return Coalesce(
+            Subquery(items.annotate(count=Count('pk')).values('count')), 0
+        )
+
+    Todo.objects.update(
+        item_count=count(items),
+        completed_count=count(items.filter(is_complete=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='completed_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='item_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_items, migrations.RunPython.noop),
+    ]
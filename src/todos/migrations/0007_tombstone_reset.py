@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todos', '0006_tombstone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tombstone',
+            name='kind',
+            field=models.CharField(choices=[('todo', 'Todo'), ('item', 'Item'), ('all', 'Reset')], max_length=4),
+        ),
+    ]
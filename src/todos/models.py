@@ -1,5 +1,64 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import events
+from .cache import invalidate_list
+
+
+# Maintained with F() updates only, see TodoQuerySet.touch().
+COUNTER_FIELDS = ('item_count', 'completed_count')
+
+
+def _count(items):
+    return Coalesce(
+        Subquery(items.annotate(count=Count('pk')).values('count')), 0
+    )
+
+
+class TodoQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """The todos owned by ``user``, a user or a user id."""
+        return self.filter(user=user)
+
+    def touch(self, items=0, completed=0):
+        """
+        Bump ``updated_at`` and shift ``item_count`` and ``completed_count``
+        by ``items`` and ``completed``, without loading or re-saving the rows.
+        """
+        changes = {'updated_at': timezone.now()}
+        if items:
+            changes['item_count'] = F('item_count') + items
+        if completed:
+            changes['completed_count'] = F('completed_count') + completed
+        return self.update(**changes)
+
+    def patch(self, pk, user_id, **changes):
+        """
+        Write ``changes`` to ``user_id``'s todo ``pk`` in a single
+        ``UPDATE ... WHERE id AND user``, without loading it first. Return
+        whether there was such a todo.
+        """
+        todos = self.for_user(user_id).filter(pk=pk)
+        if not todos.update(updated_at=timezone.now(), **changes):
+            return False
+        events.publish(user_id, events.TODO, events.SAVED, [pk])
+        invalidate_list(user_id)
+        return True
+
+    def recount(self):
+        """Recompute the item counters from the items table."""
+        items = (
+            TodoItem.objects.filter(todo=OuterRef('pk'))
+            .order_by()
+            .values('todo')
+        )
+        return self.update(
+            item_count=_count(items),
+            completed_count=_count(items.filter(is_complete=True)),
+        )
 
 
 class Todo(models.Model):
@@ -10,10 +69,121 @@ class Todo(models.Model):
     description = models.TextField(default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    item_count = models.IntegerField(default=0, editable=False)
+    completed_count = models.IntegerField(default=0, editable=False)
+
+    objects = TodoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A user's todos in (updated_at, id) order: listings, keyset
+            # pagination and the conditional GET aggregate.
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='todos_todo_user_recent_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Writing back the counters as they were loaded would undo item
+        # changes made since, so updates leave them out.
+        inserting = self._state.adding or kwargs.get('force_insert')
+        if not (inserting or args) and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        # The todo and its owner's totals are written together (see
+        # TodoItem.save()).
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if inserting:
+                TodoStats.objects.shift(self.user_id, todos=1)
+        events.publish(self.user_id, events.TODO, events.SAVED, [self.pk])
+        invalidate_list(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        with transaction.atomic(savepoint=False):
+            # The counters as they are in the database, not as loaded: item
+            # writes since then moved them.
+            counts = (
+                Todo.objects.select_for_update()
+                .filter(pk=pk)
+                .values_list(*COUNTER_FIELDS)
+                .first()
+            )
+            result = super().delete(*args, **kwargs)
+            if counts is not None:
+                items, completed = counts
+                # Its items go with it, so they need no tombstones of their
+                # own.
+                Tombstone.objects.record(self.user_id, Tombstone.TODO, [pk])
+                TodoStats.objects.shift(
+                    self.user_id,
+                    todos=-1,
+                    items=-items,
+                    completed=-completed,
+                )
+        if counts is not None:
+            events.publish(self.user_id, events.TODO, events.DELETED, [pk])
+        invalidate_list(self.user_id)
+        return result
+
+
+class TodoItemQuerySet(models.QuerySet):
+    def for_user(self, user, todo_id=None):
+        """
+        The items of ``user``'s todos, or of their todo ``todo_id`` only,
+        with the todo loaded by the join that checks the owner.
+        """
+        items = self.filter(todo__user=user).select_related('todo')
+        if todo_id is not None:
+            items = items.filter(todo_id=todo_id)
+        return items
+
+    def patch(self, pk, todo_id, user_id, **changes):
+        """
+        Write ``changes`` to item ``pk`` of ``user_id``'s todo ``todo_id``
+        in a single ``UPDATE ... WHERE id AND owner``, without loading it
+        first. Return whether there was such an item.
+
+        A change of ``is_complete`` is made on the condition that the item
+        had the other value, which tells whether ``completed_count`` moves
+        without reading the item. Only when it already had the new value is
+        a second UPDATE run for the other fields.
+        """
+        # The owner check is a subquery on the todo's primary key rather
+        # than a join, which Django would turn into WHERE id IN (SELECT ...).
+        owned = Todo.objects.for_user(user_id).filter(pk=todo_id)
+        items = self.filter(pk=pk, todo_id=todo_id, todo__in=owned)
+        changes['updated_at'] = timezone.now()
+
+        with transaction.atomic(savepoint=False):
+            completed = 0
+            is_complete = changes.get('is_complete')
+            if is_complete is not None:
+                flipped = items.filter(is_complete=not is_complete)
+                if flipped.update(**changes):
+                    completed = 1 if is_complete else -1
+            if not completed and not items.update(**changes):
+                return False
+
+            Todo.objects.filter(pk=todo_id).touch(completed=completed)
+            TodoStats.objects.shift(user_id, completed=completed)
+        events.publish(
+            user_id, events.ITEM, events.SAVED, [pk], todo=todo_id
+        )
+        invalidate_list(user_id)
+        return True
+
 
 class TodoItem(models.Model):
     name = models.CharField(max_length=255)
@@ -22,5 +192,249 @@ class TodoItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TodoItemQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['todo', 'is_complete', 'id'],
+                name='todos_item_todo_complete_idx',
+            ),
+            # Open items are the ones clients page through the most.
+            models.Index(
+                fields=['todo', 'id'],
+                condition=models.Q(is_complete=False),
+                name='todos_item_open_idx',
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
+
+    def _stored(self):
+        """
+        The ``(todo_id, is_complete)`` the item counts for in the database,
+        locked until the end of the transaction, or ``None`` if it has no
+        row. The counters are shifted from this rather than from the state
+        the instance was loaded with, which another request may have
+        changed since.
+        """
+        if self.pk is None:
+            return None
+        return (
+            TodoItem.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list('todo_id', 'is_complete')
+            .first()
+        )
+
+    def _counted(self, stored, update_fields=None):
+        # Read from __dict__ so that deferred fields are not loaded. Those,
+        # and the fields left out of update_fields, keep their stored values.
+        todo_id = self.__dict__.get('todo_id')
+        is_complete = self.__dict__.get('is_complete')
+        if stored is not None:
+            partial = update_fields is not None
+            if todo_id is None or (
+                partial and not {'todo', 'todo_id'} & update_fields
+            ):
+                todo_id = stored[0]
+            if is_complete is None or (
+                partial and 'is_complete' not in update_fields
+            ):
+                is_complete = stored[1]
+        return todo_id, is_complete
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # The row, its todo's counters and its owner's totals change
+        # together or not at all. Without a savepoint: a failure aborts the
+        # caller's transaction too, rather than let it commit half of this.
+        with transaction.atomic(savepoint=False):
+            stored = self._stored()
+            super().save(*args, **kwargs)
+            self._todo_changed(
+                stored,
+                self._counted(
+                    stored,
+                    None if update_fields is None else set(update_fields),
+                ),
+            )
+        self._publish(events.SAVED, self.pk)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        with transaction.atomic(savepoint=False):
+            stored = self._stored()
+            result = super().delete(*args, **kwargs)
+            if stored is not None:
+                Tombstone.objects.record(
+                    self.todo.user_id, Tombstone.ITEM, [pk]
+                )
+            self._todo_changed(before=stored)
+        if stored is not None:
+            self._publish(events.DELETED, pk)
+        return result
+
+    def _publish(self, action, pk):
+        events.publish(
+            self.todo.user_id, events.ITEM, action, [pk], todo=self.todo_id
+        )
+
+    # A todo's updated_at also covers its items, so that its validators
+    # change whenever one of them does. Its counters are shifted in the same
+    # UPDATE, then its owner's totals. Bulk writes do this explicitly.
+    def _todo_changed(self, before=None, after=None):
+        deltas = {self.todo_id: [0, 0]}
+        for sign, counted in ((-1, before), (1, after)):
+            if counted is not None:
+                todo_id, is_complete = counted
+                delta = deltas.setdefault(todo_id, [0, 0])
+                delta[0] += sign
+                delta[1] += sign * is_complete
+
+        totals = {}
+        for todo_id, (items, completed) in deltas.items():
+            Todo.objects.filter(pk=todo_id).touch(items, completed)
+            if todo_id == self.todo_id:
+                user_id = self.todo.user_id
+            else:
+                # The todo the item was moved out of.
+                user_id = (
+                    Todo.objects.filter(pk=todo_id)
+                    .values_list('user_id', flat=True)
+                    .first()
+                )
+            if user_id is not None:
+                total = totals.setdefault(user_id, [0, 0])
+                total[0] += items
+                total[1] += completed
+
+        for user_id, (items, completed) in totals.items():
+            TodoStats.objects.shift(user_id, items=items, completed=completed)
+            invalidate_list(user_id)
+
+
+STATS_FIELDS = ('todo_count', 'item_count', 'completed_count')
+
+
+class TodoStatsQuerySet(models.QuerySet):
+    def shift(self, user_id, todos=0, items=0, completed=0):
+        """
+        Shift a user's totals with F() expressions, building their row from
+        scratch if they have none yet.
+        """
+        changes = {
+            name: F(name) + delta
+            for name, delta in zip(STATS_FIELDS, (todos, items, completed))
+            if delta
+        }
+        if changes and not self.filter(pk=user_id).update(**changes):
+            self.rebuild(user_id)
+
+    def totals(self, user_ids):
+        """Compute the totals of ``user_ids`` from their todos and items."""
+        rows = (
+            Todo.objects.filter(user_id__in=user_ids)
+            .values('user_id')
+            .annotate(
+                todo_count=Count('pk', distinct=True),
+                item_count=Count('items'),
+                completed_count=Count(
+                    'items', filter=Q(items__is_complete=True)
+                ),
+            )
+            .order_by()
+        )
+        totals = {user_id: TodoStats(user_id=user_id) for user_id in user_ids}
+        for row in rows:
+            totals[row['user_id']] = TodoStats(**row)
+        return totals
+
+    def rebuild(self, user_id):
+        """Recompute a user's totals from their todos and items."""
+        stats = self.totals([user_id])[user_id]
+        self.bulk_create(
+            [stats],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=STATS_FIELDS,
+        )
+        return stats
+
+
+class TodoStats(models.Model):
+    """
+    A user's totals, shifted along with every change to their todos and
+    items so that reading them is a primary key lookup.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='todo_stats',
+    )
+    todo_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+
+    objects = TodoStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'todo stats'
+
+    @property
+    def completion_rate(self):
+        if not self.item_count:
+            return 0.0
+        return self.completed_count / self.item_count
+
+
+class TombstoneQuerySet(models.QuerySet):
+    def record(self, user_id, kind, object_ids):
+        """Record that ``user_id`` lost the ``kind`` objects ``object_ids``."""
+        return self.bulk_create(
+            Tombstone(user_id=user_id, kind=kind, object_id=object_id)
+            for object_id in object_ids
+        )
+
+
+class Tombstone(models.Model):
+    """
+    A deleted todo or item, kept so that syncing clients learn about the
+    deletion. Pruned after ``TODOS_TOMBSTONE_RETENTION_DAYS``.
+
+    A ``RESET`` (with ``object_id`` 0) stands for all of a user's todos: an
+    import changed them in ways a delta sync cannot tell.
+    """
+
+    TODO = 'todo'
+    ITEM = 'item'
+    RESET = 'all'
+    KIND_CHOICES = [(TODO, 'Todo'), (ITEM, 'Item'), (RESET, 'Reset')]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+'
+    )
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    objects = TombstoneQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A user's deletions since a change token.
+            models.Index(
+                fields=['user', 'deleted_at'],
+                name='todos_tombstone_user_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'], name='todos_tombstone_deleted_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.kind} {self.object_id}'
+
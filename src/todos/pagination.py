@@ -0,0 +1,257 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+NEXT = 'n'
+PREV = 'p'
+
+# The largest id a database driver accepts as a query parameter.
+MAX_ID = 2**63 - 1
+
+
+def encode_cursor(position, direction):
+    updated_at, pk = position
+    payload = {'u': updated_at.isoformat(), 'i': pk, 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return ``((updated_at, id), direction)`` for an opaque cursor string.
+
+    Raises ``ValueError`` for anything that was not produced by
+    ``encode_cursor``.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        updated_at = datetime.fromisoformat(payload['u'])
+        # Offsets that take it past year 9999 fail here, not in the query.
+        if updated_at.tzinfo is not None:
+            updated_at = updated_at.astimezone(timezone.utc)
+        pk = int(payload['i'])
+        direction = payload['d']
+    except (
+        binascii.Error, TypeError, KeyError, ValueError, OverflowError
+    ) as exc:
+        raise ValueError('Invalid cursor.') from exc
+
+    if (
+        direction not in (NEXT, PREV)
+        or updated_at.tzinfo is None
+        or not 0 <= pk <= MAX_ID
+    ):
+        raise ValueError('Invalid cursor.')
+    return (updated_at, pk), direction
+
+
+def encode_id_cursor(pk, descending, direction):
+    payload = {'i': pk, 'o': int(descending), 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_id_cursor(cursor):
+    """
+    Return ``(id, descending, direction)`` for a cursor made by
+    ``encode_id_cursor``, or raise ``ValueError``.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        pk = int(payload['i'])
+        descending = payload['o']
+        direction = payload['d']
+    except (
+        binascii.Error, TypeError, KeyError, ValueError, OverflowError
+    ) as exc:
+        raise ValueError('Invalid cursor.') from exc
+
+    if (
+        direction not in (NEXT, PREV)
+        or descending not in (0, 1)
+        or not 0 <= pk <= MAX_ID
+    ):
+        raise ValueError('Invalid cursor.')
+    return pk, bool(descending), direction
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over ``(updated_at, id)``.
+
+    Every page is a single range scan starting right after (or right before)
+    the row the cursor points at, so its cost does not depend on how deep
+    into the listing the client is.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('updated_at', 'id')
+
+    def __init__(self):
+        self.page_size = settings.TODOS_PAGE_SIZE
+        self.max_page_size = settings.TODOS_MAX_PAGE_SIZE
+        self.next_cursor = None
+        self.prev_cursor = None
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            page_size = 0
+        if page_size < 1:
+            raise ValidationError(
+                {self.page_size_query_param: 'Must be a positive integer.'}
+            )
+        return min(page_size, self.max_page_size)
+
+    def get_cursor(self, request):
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None, NEXT
+        try:
+            return decode_cursor(value)
+        except ValueError:
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+
+    def encode_cursor(self, position, direction):
+        return encode_cursor(position, direction)
+
+    def _position_of(self, obj):
+        # Pages hold model instances or values() rows.
+        if isinstance(obj, dict):
+            return tuple(obj[field] for field in self.ordering)
+        return tuple(getattr(obj, field) for field in self.ordering)
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return ``queryset`` narrowed to the requested page plus one row, and
+        remember what ``get_page()`` needs to turn the rows into a page.
+        """
+        self._page_size = self.get_page_size(request)
+        self._position, self._direction = self.get_cursor(request)
+        position = self._position
+        first, second = self.ordering
+
+        if position is None:
+            queryset = queryset.order_by(first, second)
+        elif self._direction == NEXT:
+            queryset = queryset.filter(
+                Q(**{f'{first}__gt': position[0]})
+                | Q(**{first: position[0], f'{second}__gt': position[1]})
+            ).order_by(first, second)
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{first}__lt': position[0]})
+                | Q(**{first: position[0], f'{second}__lt': position[1]})
+            ).order_by(f'-{first}', f'-{second}')
+
+        # One extra row tells us whether another page exists in that direction.
+        return queryset[: self._page_size + 1]
+
+    def get_page(self, rows):
+        """Set the cursors from the rows of ``get_page_queryset()``."""
+        has_more = len(rows) > self._page_size
+        page = rows[: self._page_size]
+
+        if self._direction == PREV:
+            page.reverse()
+            has_next = self._position is not None
+            has_prev = has_more
+        else:
+            has_next = has_more
+            has_prev = self._position is not None
+
+        if page and has_next:
+            self.next_cursor = self.encode_cursor(
+                self._position_of(page[-1]), NEXT
+            )
+        if page and has_prev:
+            self.prev_cursor = self.encode_cursor(
+                self._position_of(page[0]), PREV
+            )
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.get_page([obj async for obj in queryset])
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.next_cursor,
+            'prev': self.prev_cursor,
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+class ItemKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over the ``id`` of a todo's items, in creation order,
+    or newest first with ``ordering=-id``.
+
+    Together with a filter on ``todo`` (and ``is_complete``) every page is a
+    range scan of ``todos_item_todo_complete_idx`` or ``todos_item_open_idx``.
+    """
+
+    ordering_query_param = 'ordering'
+    orderings = ('id', '-id')
+    ordering = ('id',)
+
+    def get_descending(self, request):
+        value = request.query_params.get(self.ordering_query_param, 'id')
+        if value not in self.orderings:
+            raise ValidationError(
+                {
+                    self.ordering_query_param: (
+                        f'Must be one of: {", ".join(self.orderings)}.'
+                    )
+                }
+            )
+        return value.startswith('-')
+
+    def get_cursor(self, request):
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None, NEXT
+        try:
+            pk, descending, direction = decode_id_cursor(value)
+        except ValueError:
+            pk = None
+        # A cursor only makes sense in the ordering it was made for.
+        if pk is None or descending != self._descending:
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+        return (pk,), direction
+
+    def encode_cursor(self, position, direction):
+        return encode_id_cursor(position[0], self._descending, direction)
+
+    def get_page_queryset(self, queryset, request):
+        self._page_size = self.get_page_size(request)
+        self._descending = self.get_descending(request)
+        self._position, self._direction = self.get_cursor(request)
+
+        # Paging back through a descending listing reads it ascending.
+        backwards = self._descending != (self._direction == PREV)
+        if self._position is not None:
+            lookup = 'id__lt' if backwards else 'id__gt'
+            queryset = queryset.filter(**{lookup: self._position[0]})
+        queryset = queryset.order_by('-id' if backwards else 'id')
+        return queryset[: self._page_size + 1]
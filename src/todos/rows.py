@@ -0,0 +1,137 @@
+"""
+Read-only fast path for rendering todos.
+
+Todos are loaded as ``values()`` rows instead of model instances. The items
+of a batch of todos come from a single ``values()`` query and are grouped by
+``todo_id`` in one pass. Rows are then turned into exactly the
+representation ``TodoSerializer`` gives, without going through DRF's
+per-field ``to_representation()`` calls.
+"""
+
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .fieldsets import REQUIRED_COLUMNS, includes_items
+from .models import TodoItem
+from .serializers import TodoItemSerializer, TodoSerializer
+
+TODO_FIELDS = TodoSerializer.Meta.fields
+ITEM_FIELDS = TodoItemSerializer.Meta.fields
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+# Serializer fields whose value is a foreign key column.
+TODO_COLUMNS = {'user': 'user_id'}
+ITEM_COLUMNS = {'todo': 'todo_id'}
+
+
+def _column(name, columns):
+    return columns.get(name, name)
+
+
+def _fields(fieldset):
+    # Serializer field order, whatever order the fieldset is in.
+    if fieldset is None:
+        return TODO_FIELDS
+    return tuple(name for name in TODO_FIELDS if name in fieldset)
+
+
+def todo_rows(queryset, fieldset=None):
+    """
+    Return ``queryset`` as ``values()`` rows with the columns needed to
+    render ``fieldset`` and to paginate and cache them.
+    """
+    required = tuple(_column(name, TODO_COLUMNS) for name in REQUIRED_COLUMNS)
+    columns = tuple(
+        _column(name, TODO_COLUMNS)
+        for name in _fields(fieldset)
+        if name != 'items'
+    )
+    return queryset.values(*dict.fromkeys(required + columns))
+
+
+def _datetime(value, tz):
+    # DRF's DateTimeField with the default ISO 8601 format.
+    if not value:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _plan(fields, columns):
+    return tuple(
+        (name, _column(name, columns), name in DATETIME_FIELDS)
+        for name in fields
+    )
+
+
+ITEM_PLAN = _plan(ITEM_FIELDS, ITEM_COLUMNS)
+ITEM_VALUES = tuple(column for _, column, _ in ITEM_PLAN)
+
+
+def _render(row, plan, tz, items=None):
+    data = {}
+    for name, column, is_datetime in plan:
+        if name == 'items':
+            data[name] = items.get(row['id'], [])
+        elif is_datetime:
+            data[name] = _datetime(row[column], tz)
+        else:
+            data[name] = row[column]
+    return data
+
+
+def item_rows(todo_ids):
+    return (
+        TodoItem.objects.filter(todo_id__in=todo_ids)
+        .order_by('id')
+        .values(*ITEM_VALUES)
+    )
+
+
+def group_items(rows):
+    """Render item rows and group them by ``todo_id``."""
+    tz = timezone.get_current_timezone()
+    items = defaultdict(list)
+    for row in rows:
+        items[row['todo_id']].append(_render(row, ITEM_PLAN, tz))
+    return items
+
+
+def render_items(rows):
+    """Render item rows like ``TodoItemSerializer(many=True)``."""
+    tz = timezone.get_current_timezone()
+    return [_render(row, ITEM_PLAN, tz) for row in rows]
+
+
+def render_todos(rows, fieldset=None, items=None):
+    """
+    Render todo rows like ``TodoSerializer(many=True, fields=fieldset)``.
+
+    ``items`` is the output of ``group_items()``, needed when the fieldset
+    includes them.
+    """
+    tz = timezone.get_current_timezone()
+    plan = _plan(_fields(fieldset), TODO_COLUMNS)
+    return [_render(row, plan, tz, items) for row in rows]
+
+
+def serialize_rows(rows, fieldset=None):
+    """Render todo rows, loading their items in one query if needed."""
+    rows = list(rows)
+    items = None
+    if rows and includes_items(fieldset):
+        items = group_items(item_rows([row['id'] for row in rows]))
+    return render_todos(rows, fieldset, items)
+
+
+async def aserialize_rows(rows, fieldset=None):
+    """Async ``serialize_rows()`` for a list of rows."""
+    items = None
+    if rows and includes_items(fieldset):
+        items = group_items(
+            [row async for row in item_rows([row['id'] for row in rows])]
+        )
+    return render_todos(rows, fieldset, items)
@@ -1,6 +1,11 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
-from todos.models import Todo, TodoItem
+from todos import events
+from todos.cache import invalidate_list
+from todos.models import Todo, TodoItem, TodoStats, Tombstone
 
 
 class TodoItemSerializer(serializers.ModelSerializer):
@@ -20,6 +25,12 @@ class TodoItemSerializer(serializers.ModelSerializer):
 class TodoSerializer(serializers.ModelSerializer):
     items = TodoItemSerializer(many=True, read_only=True)
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Todo
         fields = (
@@ -28,7 +39,135 @@ class TodoSerializer(serializers.ModelSerializer):
             'user',
             'description',
             'items',
+            'item_count',
+            'completed_count',
             'created_at',
             'updated_at',
         )
-        read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        read_only_fields = (
+            'id',
+            'user',
+            'item_count',
+            'completed_count',
+            'created_at',
+            'updated_at',
+        )
+
+
+class TodoStatsSerializer(serializers.ModelSerializer):
+    completion_rate = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = TodoStats
+        fields = (
+            'todo_count',
+            'item_count',
+            'completed_count',
+            'completion_rate',
+        )
+        read_only_fields = fields
+
+
+class TodoItemBulkUpdateSerializer(TodoItemSerializer):
+    id = serializers.IntegerField()
+
+    class Meta(TodoItemSerializer.Meta):
+        extra_kwargs = {'name': {'required': False}}
+
+
+class TodoItemBulkSerializer(serializers.Serializer):
+    create = TodoItemSerializer(many=True, required=False)
+    update = TodoItemBulkUpdateSerializer(many=True, required=False)
+    delete = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    def validate(self, attrs):
+        creates = attrs.setdefault('create', [])
+        updates = attrs.setdefault('update', [])
+        deletes = attrs.setdefault('delete', [])
+
+        total = len(creates) + len(updates) + len(deletes)
+        if total > settings.TODOS_MAX_BULK_ITEMS:
+            raise serializers.ValidationError(
+                f'At most {settings.TODOS_MAX_BULK_ITEMS} items can be '
+                'changed in a single request.'
+            )
+
+        ids = [item['id'] for item in updates] + deletes
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Each item id may only appear once across update and delete.'
+            )
+        return attrs
+
+    def save(self, todo):
+        # The ``create``/``update`` fields shadow the usual ModelSerializer
+        # hooks, so the changes are applied here instead.
+        validated_data = self.validated_data
+        updates = {item.pop('id'): item for item in validated_data['update']}
+        deletes = validated_data['delete']
+
+        with transaction.atomic():
+            if updates or deletes:
+                items = (
+                    TodoItem.objects.select_for_update()
+                    .filter(todo=todo)
+                    .in_bulk([*updates, *deletes])
+                )
+                unknown = [pk for pk in [*updates, *deletes] if pk not in items]
+                if unknown:
+                    raise serializers.ValidationError(
+                        {'error': 'This Todo has no Items matching the ids '
+                         f'provided: {unknown}.'}
+                    )
+
+            created = TodoItem.objects.bulk_create(
+                TodoItem(todo=todo, **item) for item in validated_data['create']
+            )
+            # Shifts of the todo's item counters, applied with touch().
+            added = len(created) - len(deletes)
+            completed = sum(item.is_complete for item in created)
+
+            if updates:
+                # bulk_update() bypasses save(), so auto_now is applied here.
+                now = timezone.now()
+                changed = {'updated_at'}
+                for pk, attrs in updates.items():
+                    if 'is_complete' in attrs:
+                        completed += (
+                            attrs['is_complete'] - items[pk].is_complete
+                        )
+                    for name, value in attrs.items():
+                        setattr(items[pk], name, value)
+                    items[pk].updated_at = now
+                    changed.update(attrs)
+                TodoItem.objects.bulk_update(
+                    [items[pk] for pk in updates], sorted(changed)
+                )
+
+            if deletes:
+                completed -= sum(items[pk].is_complete for pk in deletes)
+                TodoItem.objects.filter(todo=todo, id__in=deletes).delete()
+                Tombstone.objects.record(todo.user_id, Tombstone.ITEM, deletes)
+
+            Todo.objects.filter(pk=todo.pk).touch(added, completed)
+            TodoStats.objects.shift(
+                todo.user_id, items=added, completed=completed
+            )
+            changes = (
+                (events.SAVED, [item.pk for item in created] + list(updates)),
+                (events.DELETED, deletes),
+            )
+            for action, ids in changes:
+                if ids:
+                    events.publish(
+                        todo.user_id, events.ITEM, action, ids, todo=todo.pk
+                    )
+            invalidate_list(todo.user_id)
+
+        return {
+            'created': [item.pk for item in created],
+            'updated': list(updates),
+            'deleted': deletes,
+        }
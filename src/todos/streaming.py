@@ -0,0 +1,108 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .rows import aserialize_rows, serialize_rows
+
+JSON = 'json'
+NDJSON = 'ndjson'
+STREAM_FORMATS = (JSON, NDJSON)
+
+CONTENT_TYPES = {
+    JSON: 'application/json',
+    NDJSON: 'application/x-ndjson',
+}
+
+
+def _dumps(data):
+    # Same output as DRF's JSONRenderer with its default compact settings.
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')
+    )
+
+
+def iter_todos(rows, fieldset=None, chunk_size=None):
+    """
+    Yield the representation of each todo row from ``rows.todo_rows()``,
+    reading ``chunk_size`` rows at a time.
+
+    ``iterator()`` uses a server-side cursor where the backend supports one,
+    and items are loaded once per chunk, so only a single chunk of todos and
+    items is ever held in memory.
+    """
+    chunk_size = chunk_size or settings.TODOS_STREAM_CHUNK_SIZE
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield from serialize_rows(chunk, fieldset)
+            chunk = []
+    yield from serialize_rows(chunk, fieldset)
+
+
+async def aiter_todos(rows, fieldset=None, chunk_size=None):
+    """Async ``iter_todos()``."""
+    chunk_size = chunk_size or settings.TODOS_STREAM_CHUNK_SIZE
+    chunk = []
+    async for row in rows.aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            for todo in await aserialize_rows(chunk, fieldset):
+                yield todo
+            chunk = []
+    for todo in await aserialize_rows(chunk, fieldset):
+        yield todo
+
+
+def iter_json_array(todos):
+    separator = '['
+    for todo in todos:
+        yield separator + _dumps(todo)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+async def aiter_json_array(todos):
+    separator = '['
+    async for todo in todos:
+        yield separator + _dumps(todo)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+def iter_ndjson(todos):
+    for todo in todos:
+        yield _dumps(todo) + '\n'
+
+
+async def aiter_ndjson(todos):
+    async for todo in todos:
+        yield _dumps(todo) + '\n'
+
+
+def stream_todos(rows, stream_format, fieldset=None):
+    todos = iter_todos(rows, fieldset)
+    if stream_format == NDJSON:
+        content = iter_ndjson(todos)
+    else:
+        content = iter_json_array(todos)
+    return StreamingHttpResponse(
+        content, content_type=CONTENT_TYPES[stream_format]
+    )
+
+
+def astream_todos(rows, stream_format, fieldset=None):
+    """
+    ``stream_todos()`` with an async iterator as the body, for async views
+    served under ASGI.
+    """
+    todos = aiter_todos(rows, fieldset)
+    if stream_format == NDJSON:
+        content = aiter_ndjson(todos)
+    else:
+        content = aiter_json_array(todos)
+    return StreamingHttpResponse(
+        content, content_type=CONTENT_TYPES[stream_format]
+    )
@@ -1,13 +1,64 @@
+import asyncio
+import base64
+import gzip
+import importlib.util
+import json
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
 from typing import cast
-
+from unittest import mock
+
+import yaml
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, models, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Prefetch
+from django.test import (
+    AsyncRequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.throttling import UserRateThrottle
 
-from accounts.models import User
+from drf_spectacular.generators import SchemaGenerator
 
-from .models import Todo, TodoItem
+from accounts.models import User
+from todoapi import boot
+from todoapi.querycount import QueryBudgetExceeded, query_budget
+from todoapi.schema import cached_schema, schema_view
+
+from . import async_views, events, views
+from .changes import make_token, parse_token
+from .checks import check_list_cache
+from .models import STATS_FIELDS, Todo, TodoItem, TodoStats, Tombstone
+from .rows import serialize_rows, todo_rows
+from .serializers import TodoItemSerializer, TodoSerializer
+
+# The token and listing caches are only used with a backend shared between
+# workers; a file-based cache stands in for Redis or Memcached.
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(),
+    }
+}
 
 
 class TodoAPITestCase(APITestCase):
@@ -113,12 +164,26 @@ class TodoAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         assert response.data is not None
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
 
-        returned_ids = {item['id'] for item in response.data}
+        returned_ids = {item['id'] for item in response.data['results']}
         expected_ids = {self.todo.pk, todo2.pk, todo3.pk}
         self.assertEqual(returned_ids, expected_ids)
 
+    def test_user_list_todos_unpaginated(self):
+        Todo.objects.create(name="todo2", user=self.user, description="desc2")
+
+        self.client.force_login(self.user)
+        response = cast(
+            Response,
+            self.client.get(self.list_todos_url, {'paginate': 'false'}),
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        assert response.data is not None
+        self.assertEqual(len(response.data), 2)
+
     def test_user_create_todo(self):
         self.client.force_login(self.user)
 
@@ -161,6 +226,201 @@ class TodoAPITestCase(APITestCase):
         self.assertFalse(Todo.objects.filter(id=self.todo.pk).exists())
 
 
+class TodoPaginationAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todos = [
+            Todo.objects.create(name=f'todo{i}', user=self.user)
+            for i in range(5)
+        ]
+        self.list_todos_url = reverse('list_todos')
+        self.client.force_login(self.user)
+
+    def get_page(self, **params):
+        response = cast(Response, self.client.get(self.list_todos_url, params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert response.data is not None
+        return response.data
+
+    def test_pages_follow_next_cursor(self):
+        first = self.get_page(page_size=2)
+        self.assertIsNone(first['prev'])
+        self.assertEqual(
+            [todo['id'] for todo in first['results']],
+            [todo.pk for todo in self.todos[:2]],
+        )
+
+        second = self.get_page(page_size=2, cursor=first['next'])
+        third = self.get_page(page_size=2, cursor=second['next'])
+        self.assertEqual(
+            [todo['id'] for todo in second['results']],
+            [todo.pk for todo in self.todos[2:4]],
+        )
+        self.assertEqual(
+            [todo['id'] for todo in third['results']], [self.todos[4].pk]
+        )
+        self.assertIsNone(third['next'])
+
+    def test_prev_cursor_returns_previous_page(self):
+        first = self.get_page(page_size=2)
+        second = self.get_page(page_size=2, cursor=first['next'])
+
+        back = self.get_page(page_size=2, cursor=second['prev'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['prev'])
+        self.assertIsNotNone(back['next'])
+
+    def test_ties_on_updated_at_are_broken_by_id(self):
+        Todo.objects.filter(user=self.user).update(
+            updated_at=self.todos[0].updated_at
+        )
+
+        seen = []
+        page = self.get_page(page_size=2)
+        seen += [todo['id'] for todo in page['results']]
+        while page['next']:
+            page = self.get_page(page_size=2, cursor=page['next'])
+            seen += [todo['id'] for todo in page['results']]
+
+        self.assertEqual(seen, [todo.pk for todo in self.todos])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_todos_url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_out_of_range_cursor(self):
+        now = timezone.now().isoformat()
+        for payload in (
+            f'{{"u":"{now}","i":1e999,"d":"n"}}',
+            f'{{"u":"{now}","i":{2**64},"d":"n"}}',
+            f'{{"u":"{now}","i":-1,"d":"n"}}',
+            '{"u":"9999-12-31T23:59:59-05:00","i":1,"d":"n"}',
+        ):
+            cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+            with self.subTest(payload=payload):
+                response = self.client.get(
+                    self.list_todos_url, {'cursor': cursor}
+                )
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+
+    def test_invalid_page_size(self):
+        response = self.client.get(self.list_todos_url, {'page_size': '0'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TodoStreamingAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todos = [
+            Todo.objects.create(name=f'todo{i}', user=self.user)
+            for i in range(3)
+        ]
+        TodoItem.objects.create(name='item', todo=self.todos[0])
+        self.list_todos_url = reverse('list_todos')
+        self.client.force_login(self.user)
+
+    def get_stream(self, stream_format):
+        response = self.client.get(
+            self.list_todos_url, {'stream': stream_format}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()  # type: ignore
+
+    def test_stream_json_matches_unpaginated_listing(self):
+        body = self.get_stream('json')
+
+        response = self.client.get(self.list_todos_url, {'paginate': 'false'})
+        self.assertEqual(json.loads(body), response.json())
+
+    def test_stream_ndjson(self):
+        lines = self.get_stream('ndjson').splitlines()
+
+        self.assertEqual(len(lines), 3)
+        first = json.loads(lines[0])
+        self.assertEqual(first['id'], self.todos[0].pk)
+        self.assertEqual(len(first['items']), 1)
+
+    def test_stream_empty_listing(self):
+        Todo.objects.all().delete()
+        self.assertEqual(json.loads(self.get_stream('json')), [])
+
+    def test_stream_unknown_format(self):
+        response = self.client.get(self.list_todos_url, {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TodoFieldsetAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(
+            name='todo', user=self.user, description='lorem ipsum'
+        )
+        TodoItem.objects.create(name='item', todo=self.todo)
+        self.list_todos_url = reverse('list_todos')
+        self.todo_url = reverse('todo', kwargs={'id': self.todo.pk})
+        self.client.force_login(self.user)
+
+    def list_results(self, **params):
+        params['paginate'] = 'false'
+        response = cast(Response, self.client.get(self.list_todos_url, params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert response.data is not None
+        return response.data
+
+    def test_fields_limits_todo_keys_and_drops_items(self):
+        results = self.list_results(fields='id,name')
+        self.assertEqual(set(results[0]), {'id', 'name'})
+
+    def test_include_items_with_fields(self):
+        results = self.list_results(fields='id,name', include='items')
+
+        self.assertEqual(set(results[0]), {'id', 'name', 'items'})
+        self.assertEqual(results[0]['items'][0]['name'], 'item')
+
+    def test_empty_include_drops_items_only(self):
+        results = self.list_results(include='')
+
+        self.assertNotIn('items', results[0])
+        self.assertEqual(results[0]['description'], 'lorem ipsum')
+
+    def test_unknown_field(self):
+        response = self.client.get(self.list_todos_url, {'fields': 'secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_include(self):
+        response = self.client.get(self.todo_url, {'include': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_todo_with_fields(self):
+        response = cast(
+            Response, self.client.get(self.todo_url, {'fields': 'name'})
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'name': 'todo'})
+
+    def test_sparse_listing_skips_prefetch_and_deferred_columns(self):
+        with CaptureQueriesContext(connection) as full:
+            self.list_results()
+        with CaptureQueriesContext(connection) as sparse:
+            self.list_results(fields='id,name')
+
+        self.assertEqual(len(sparse), len(full) - 1)
+        todo_query = next(
+            query['sql'] for query in sparse if 'todos_todo' in query['sql']
+        )
+        self.assertNotIn('description', todo_query)
+
+
 class TodoItemAPITestCase(APITestCase):
     def setUp(self):
         self.username = 'foo'
@@ -302,3 +562,2258 @@ class TodoItemAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertFalse(TodoItem.objects.filter(id=self.todo_item.pk).exists())
+
+
+class TodoItemBulkAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.items = [
+            TodoItem.objects.create(name=f'item{i}', todo=self.todo)
+            for i in range(3)
+        ]
+        self.bulk_url = reverse('bulk_todo_items', kwargs={'id': self.todo.pk})
+
+    def post(self, data):
+        return cast(
+            Response, self.client.post(self.bulk_url, data=data, format='json')
+        )
+
+    def test_unauthorized_bulk(self):
+        response = self.post({'delete': [self.items[0].pk]})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(TodoItem.objects.count(), 3)
+
+    def test_other_user_cannot_bulk_change_items(self):
+        other_user = User.objects.create_user(
+            username="bar", email="bar@foo.com", password="foo"
+        )
+        self.client.force_login(other_user)
+
+        response = self.post({'delete': [self.items[0].pk]})
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(TodoItem.objects.count(), 3)
+
+    def test_user_bulk_create_update_delete(self):
+        self.client.force_login(self.user)
+
+        response = self.post({
+            'create': [{'name': 'new1'}, {'name': 'new2', 'is_complete': True}],
+            'update': [
+                {'id': self.items[0].pk, 'is_complete': True},
+                {'id': self.items[1].pk, 'name': 'renamed'},
+            ],
+            'delete': [self.items[2].pk],
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert response.data is not None
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(response.data['deleted'], [self.items[2].pk])
+
+        self.items[0].refresh_from_db()
+        self.items[1].refresh_from_db()
+        self.assertTrue(self.items[0].is_complete)
+        self.assertEqual(self.items[0].name, 'item0')
+        self.assertEqual(self.items[1].name, 'renamed')
+        self.assertGreater(self.items[0].updated_at, self.items[0].created_at)
+        self.assertFalse(TodoItem.objects.filter(id=self.items[2].pk).exists())
+        self.assertTrue(
+            TodoItem.objects.filter(
+                todo=self.todo, name='new2', is_complete=True
+            ).exists()
+        )
+
+    def test_bulk_queries_do_not_grow_with_item_count(self):
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as few:
+            self.post({'create': [{'name': 'new'}]})
+        with CaptureQueriesContext(connection) as many:
+            self.post({'create': [{'name': f'new{i}'} for i in range(50)]})
+
+        self.assertEqual(len(few), len(many))
+
+    def test_unknown_item_rolls_back_whole_request(self):
+        other_todo = Todo.objects.create(name='other', user=self.user)
+        foreign_item = TodoItem.objects.create(name='foreign', todo=other_todo)
+        self.client.force_login(self.user)
+
+        response = self.post({
+            'create': [{'name': 'new'}],
+            'delete': [self.items[0].pk, foreign_item.pk],
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TodoItem.objects.filter(todo=self.todo).count(), 3)
+        self.assertTrue(TodoItem.objects.filter(id=foreign_item.pk).exists())
+
+    def test_duplicate_ids(self):
+        self.client.force_login(self.user)
+
+        response = self.post({
+            'update': [{'id': self.items[0].pk, 'is_complete': True}],
+            'delete': [self.items[0].pk],
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_item(self):
+        self.client.force_login(self.user)
+
+        response = self.post({'create': [{'name': 'ok'}, {'is_complete': True}]})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TodoItem.objects.count(), 3)
+
+    @override_settings(TODOS_MAX_BULK_ITEMS=2)
+    def test_too_many_items(self):
+        self.client.force_login(self.user)
+
+        response = self.post({'create': [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TodoItem.objects.count(), 3)
+
+
+class TodoTransferAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.other_user = User.objects.create_user(
+            username='bar', email='bar@foo.com', password='foo'
+        )
+        for i in range(3):
+            todo = Todo.objects.create(
+                name=f'todo{i}', user=self.user, description=f'desc{i}'
+            )
+            for j in range(2):
+                TodoItem.objects.create(
+                    name=f'item{i}.{j}', todo=todo, is_complete=bool(j)
+                )
+        self.export_url = reverse('export_todos')
+        self.import_url = reverse('import_todos')
+
+    def export(self, user):
+        self.client.force_login(user)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return b''.join(response.streaming_content)  # type: ignore
+
+    def import_(self, user, body):
+        self.client.force_login(user)
+        return cast(
+            Response,
+            self.client.post(
+                self.import_url, data=body, content_type='application/x-ndjson'
+            ),
+        )
+
+    def snapshot(self, user):
+        return sorted(
+            (item.todo.name, item.todo.description, item.name, item.is_complete)
+            for item in TodoItem.objects.filter(todo__user=user)
+        )
+
+    def test_unauthorized_export(self):
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_import_roundtrip(self):
+        body = self.export(self.user)
+        self.assertEqual(len(body.splitlines()), 9)
+
+        response = self.import_(self.other_user, body)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert response.data is not None
+        self.assertEqual(response.data['todos'], 3)
+        self.assertEqual(response.data['items'], 6)
+        self.assertEqual(
+            self.snapshot(self.other_user), self.snapshot(self.user)
+        )
+
+    def test_import_keeps_timestamps(self):
+        body = self.export(self.user)
+        self.import_(self.other_user, body)
+
+        original = Todo.objects.filter(user=self.user).order_by('id')
+        imported = Todo.objects.filter(user=self.other_user).order_by('id')
+        self.assertEqual(
+            [todo.created_at for todo in imported],
+            [todo.created_at for todo in original],
+        )
+
+    def test_invalid_import_writes_nothing(self):
+        body = (
+            b'{"type":"todo","id":1,"name":"ok"}\n'
+            b'{"type":"item","todo":1,"name":"ok"}\n'
+            b'{"type":"item","todo":2,"name":"orphan"}\n'
+        )
+
+        response = self.import_(self.other_user, body)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        assert response.data is not None
+        self.assertEqual(response.data['line'], 3)
+        self.assertFalse(Todo.objects.filter(user=self.other_user).exists())
+
+    def test_import_rejects_invalid_utf8(self):
+        body = (
+            b'{"type":"todo","id":1,"name":"ok"}\n'
+            b'{"type":"todo","id":2,"name":"caf\xe9"}\n'
+        )
+
+        response = self.import_(self.other_user, body)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        assert response.data is not None
+        self.assertEqual(response.data['line'], 2)
+        self.assertFalse(Todo.objects.filter(user=self.other_user).exists())
+
+    def test_import_rejects_out_of_range_timestamps(self):
+        body = (
+            b'{"type":"todo","id":1,"name":"ok"}\n'
+            b'{"type":"todo","id":2,"name":"late",'
+            b'"created_at":"2024-13-45T00:00:00Z"}\n'
+        )
+
+        response = self.import_(self.other_user, body)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        assert response.data is not None
+        self.assertEqual(response.data['line'], 2)
+        self.assertIn('created_at', response.data['error'])
+
+    def test_import_command_rejects_invalid_utf8(self):
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as import_file:
+            import_file.write(b'{"type":"todo","id":1,"name":"caf\xe9"}\n')
+            import_file.flush()
+            with self.assertRaisesMessage(CommandError, 'Line 1'):
+                call_command('import_todos', 'bar', import_file.name)
+
+    def test_management_commands_roundtrip(self):
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as export_file:
+            call_command('export_todos', 'foo', output=export_file.name)
+            stdout = StringIO()
+            call_command(
+                'import_todos', 'bar', export_file.name, batch_size=2,
+                stdout=stdout,
+            )
+
+        self.assertIn('Imported 3 todos and 6 items.', stdout.getvalue())
+        self.assertEqual(
+            self.snapshot(self.other_user), self.snapshot(self.user)
+        )
+
+
+class TodoConditionalGetAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.list_todos_url = reverse('list_todos')
+        self.todo_url = reverse('todo', kwargs={'id': self.todo.pk})
+        self.client.force_login(self.user)
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response['ETag']
+
+    def test_list_not_modified(self):
+        etag = self.get_etag(self.list_todos_url)
+
+        response = self.client.get(self.list_todos_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_list_etag_depends_on_query(self):
+        etag = self.get_etag(self.list_todos_url)
+
+        response = self.client.get(
+            self.list_todos_url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_item_change_invalidates_list_and_todo(self):
+        list_etag = self.get_etag(self.list_todos_url)
+        todo_etag = self.get_etag(self.todo_url)
+
+        self.item.is_complete = True
+        self.item.save()
+
+        response = self.client.get(
+            self.list_todos_url, HTTP_IF_NONE_MATCH=list_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.todo_url, HTTP_IF_NONE_MATCH=todo_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_item_change_invalidates_todo(self):
+        etag = self.get_etag(self.todo_url)
+
+        self.client.post(
+            reverse('bulk_todo_items', kwargs={'id': self.todo.pk}),
+            data={'delete': [self.item.pk]},
+            format='json',
+        )
+
+        response = self.client.get(self.todo_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleting_todo_invalidates_list(self):
+        other = Todo.objects.create(name='other', user=self.user)
+        etag = self.get_etag(self.list_todos_url)
+
+        other.delete()
+
+        response = self.client.get(self.list_todos_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deleting_older_todo_is_not_hidden_by_last_modified(self):
+        older = Todo.objects.create(name='older', user=self.user)
+        Todo.objects.filter(pk=older.pk).update(
+            updated_at=self.todo.updated_at - timedelta(days=1)
+        )
+        response = self.client.get(self.list_todos_url)
+        self.assertNotIn('Last-Modified', response)
+
+        older.delete()
+
+        response = self.client.get(
+            self.list_todos_url,
+            HTTP_IF_MODIFIED_SINCE=http_date(timezone.now().timestamp()),
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_todo_not_modified_since(self):
+        response = self.client.get(self.todo_url)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(
+            self.todo_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_user_gets_forbidden_not_304(self):
+        etag = self.get_etag(self.todo_url)
+        other_user = User.objects.create_user(
+            username="bar", email="bar@foo.com", password="foo"
+        )
+        self.client.force_login(other_user)
+
+        response = self.client.get(self.todo_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(CACHES=SHARED_CACHES, TODOS_LIST_CACHE_TIMEOUT=300)
+class TodoListCacheAPITestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.list_todos_url = reverse('list_todos')
+        self.client.force_login(self.user)
+
+    def get_list(self):
+        response = cast(Response, self.client.get(self.list_todos_url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_second_request_is_a_hit(self):
+        first = self.get_list()
+        second = self.get_list()
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_hit_does_not_query_the_todos(self):
+        self.get_list()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_list()
+
+        self.assertFalse(
+            any('todos_' in query['sql'] for query in queries.captured_queries)
+        )
+
+    def test_create_todo_invalidates(self):
+        self.get_list()
+
+        self.client.post(self.list_todos_url, data={'name': 'new'})
+
+        response = self.get_list()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        assert response.data is not None
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_update_item_invalidates(self):
+        self.get_list()
+
+        self.client.put(
+            reverse(
+                'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+            ),
+            data={'name': 'item', 'is_complete': True},
+        )
+
+        response = self.get_list()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        assert response.data is not None
+        self.assertTrue(response.data['results'][0]['items'][0]['is_complete'])
+
+    def test_other_user_is_not_invalidated(self):
+        other_user = User.objects.create_user(
+            username="bar", email="bar@foo.com", password="foo"
+        )
+        self.get_list()
+
+        Todo.objects.create(name='other', user=other_user)
+
+        self.assertEqual(self.get_list()['X-Cache'], 'HIT')
+
+    def test_stats_command(self):
+        self.get_list()
+        self.get_list()
+        self.get_list()
+
+        stdout = StringIO()
+        call_command('todos_cache_stats', reset=True, stdout=stdout)
+
+        self.assertIn('hits: 2', stdout.getvalue())
+        self.assertIn('misses: 1', stdout.getvalue())
+        self.assertIn('hit ratio: 66.7%', stdout.getvalue())
+
+    @override_settings(TODOS_LIST_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.get_list()
+        self.assertNotIn('X-Cache', self.get_list())
+
+    def test_per_process_cache_is_not_used(self):
+        locmem = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        }
+        with self.settings(CACHES=locmem):
+            self.get_list()
+            self.assertNotIn('X-Cache', self.get_list())
+            self.assertEqual(
+                [error.id for error in check_list_cache(None)], ['todos.W001']
+            )
+            # Nothing to warn about while the cache is off.
+            with self.settings(TODOS_LIST_CACHE_TIMEOUT=0):
+                self.assertEqual(check_list_cache(None), [])
+
+            stdout = StringIO()
+            call_command('todos_cache_stats', stdout=stdout)
+            self.assertIn('The listing cache is disabled', stdout.getvalue())
+
+
+@override_settings(TODOS_LIST_CACHE_TIMEOUT=0)
+class TodoFragmentCacheAPITestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todos = [
+            Todo.objects.create(name=f'todo{i}', user=self.user)
+            for i in range(3)
+        ]
+        self.item = TodoItem.objects.create(name='item', todo=self.todos[0])
+        self.list_todos_url = reverse('list_todos')
+        self.client.force_login(self.user)
+
+    def get_results(self, **params):
+        response = cast(Response, self.client.get(self.list_todos_url, params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert response.data is not None
+        return response.data['results']
+
+    def serialized_ids(self, **params):
+        with mock.patch(
+            'todos.fragments.serialize_rows', wraps=serialize_rows
+        ) as serialize:
+            results = self.get_results(**params)
+        ids = [
+            row['id']
+            for call in serialize.call_args_list
+            for row in call.args[0]
+        ]
+        return results, ids
+
+    def test_only_changed_todos_are_serialized(self):
+        _, ids = self.serialized_ids()
+        self.assertEqual(len(ids), 3)
+
+        self.item.is_complete = True
+        self.item.save()
+
+        results, ids = self.serialized_ids()
+        self.assertEqual(ids, [self.todos[0].pk])
+        self.assertTrue(results[-1]['items'][0]['is_complete'])
+
+    def test_unchanged_listing_loads_no_items(self):
+        self.get_results()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_results()
+
+        self.assertFalse(
+            any('todos_todoitem' in query['sql'] for query in queries)
+        )
+
+    def test_fragments_are_kept_per_fieldset(self):
+        self.get_results()
+
+        results, ids = self.serialized_ids(fields='id,name')
+
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(set(results[0]), {'id', 'name'})
+
+    @override_settings(TODOS_FRAGMENT_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.get_results()
+        _, ids = self.serialized_ids()
+        self.assertEqual(len(ids), 3)
+
+
+class ExplainQueriesCommandTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        todo = Todo.objects.create(name='todo', user=self.user)
+        TodoItem.objects.create(name='item', todo=todo)
+
+    def test_view_queries_use_indexes(self):
+        stdout = StringIO()
+        call_command('explain_queries', 'foo', check=True, stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn('list_todos: GET /todos/', output)
+        self.assertIn('todos_todo_user_recent_idx', output)
+        self.assertIn('create_todo_item: GET /todos/', output)
+        self.assertIn('todo_changes: GET /todos/changes/?since=', output)
+        self.assertIn('todos_tombstone_user_idx', output)
+
+
+class HotQueryIndexMigrationTestCase(APITestCase):
+    def test_indexes_are_built_concurrently_on_postgres(self):
+        migration = import_module('todos.migrations.0003_hot_query_indexes')
+        state = MigrationLoader(connection).project_state(
+            ('todos', '0003_hot_query_indexes')
+        )
+        schema_editor = mock.Mock()
+        schema_editor.connection.vendor = 'postgresql'
+        schema_editor.connection.alias = 'default'
+
+        for operation in migration.Migration.operations:
+            operation.database_forwards('todos', schema_editor, state, state)
+
+        self.assertFalse(migration.Migration.atomic)
+        self.assertEqual(
+            [call.args[1].name for call in schema_editor.add_index.mock_calls],
+            [
+                'todos_todo_user_recent_idx',
+                'todos_item_todo_complete_idx',
+                'todos_item_open_idx',
+            ],
+        )
+        for call in schema_editor.add_index.mock_calls:
+            self.assertEqual(call.kwargs, {'concurrently': True})
+
+
+# As deployed with a shared cache, tokens and listings cached.
+@override_settings(
+    CACHES=SHARED_CACHES,
+    TOKEN_AUTH_CACHE_TIMEOUT=300,
+    TODOS_LIST_CACHE_TIMEOUT=300,
+)
+class TodoQueryBudgetTestCase(APITestCase):
+    """
+    Upper bounds on the queries each endpoint runs, token authentication
+    included. A failure lists the queries that were run.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todos = [
+            Todo.objects.create(name=f'todo{i}', user=self.user)
+            for i in range(5)
+        ]
+        for todo in self.todos:
+            for j in range(3):
+                TodoItem.objects.create(name=f'item{j}', todo=todo)
+        self.todo = self.todos[0]
+        self.item = self.todo.items.first()
+        self.todo_url = reverse('todo', kwargs={'id': self.todo.pk})
+        self.todo_item_url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)  # type: ignore
+
+    def test_list_todos(self):
+        with query_budget(4):
+            response = self.client.get(reverse('list_todos'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_todos_cached(self):
+        self.client.get(reverse('list_todos'))
+        with query_budget(0):
+            response = self.client.get(reverse('list_todos'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    # Writes include the UPDATE of the owner's TodoStats row, deletions
+    # the INSERT of a tombstone. Item saves and deletions first lock the
+    # item's row to read what it counts for.
+    def test_create_todo(self):
+        with query_budget(3):
+            response = self.client.post(
+                reverse('list_todos'), data={'name': 'new'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_todo(self):
+        with query_budget(4):
+            response = self.client.get(self.todo_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_todo(self):
+        with query_budget(4):
+            response = self.client.put(self.todo_url, data={'name': 'new'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_create_item(self):
+        create_todo_item_url = reverse(
+            'create_todo_item', kwargs={'id': self.todo.pk}
+        )
+        with query_budget(5):
+            response = self.client.post(
+                create_todo_item_url, data={'name': 'new'}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_item(self):
+        with query_budget(2):
+            response = self.client.get(self.todo_item_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_item(self):
+        with query_budget(6):
+            response = self.client.put(
+                self.todo_item_url, data={'name': 'new', 'is_complete': True}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_patch_item(self):
+        with query_budget(4):
+            response = self.client.patch(
+                self.todo_item_url, data={'is_complete': True}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_item(self):
+        with query_budget(7):
+            response = self.client.delete(self.todo_item_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_budget_failure_lists_queries(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'budget is 1'):
+            with query_budget(1):
+                self.client.get(self.todo_item_url)
+
+    @override_settings(QUERY_COUNT_HEADERS=True)
+    def test_query_count_headers(self):
+        response = self.client.get(self.todo_item_url)
+
+        self.assertEqual(response['X-DB-Query-Count'], '2')
+        self.assertGreaterEqual(float(response['X-DB-Query-Time']), 0)
+
+    @override_settings(QUERY_COUNT_HEADERS=False)
+    def test_query_count_headers_disabled(self):
+        response = self.client.get(self.todo_item_url)
+        self.assertNotIn('X-DB-Query-Count', response)
+
+
+class TodoAsyncViewsTestCase(APITestCase):
+    """
+    The async views answer like the DRF ones for the same requests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.other = User.objects.create_user(
+            username='baz', email='baz@bar.com', password='bar'
+        )
+        self.todos = [
+            Todo.objects.create(name=f'todo{i}', user=self.user)
+            for i in range(3)
+        ]
+        self.todo = self.todos[0]
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.other_todo = Todo.objects.create(name='other', user=self.other)
+
+        self.token = Token.objects.create(user=self.user)
+        self.auth = 'Token ' + self.token.key
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)  # type: ignore
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, method, path, data=None, **kwargs):
+        headers = kwargs.pop('headers', {'Authorization': self.auth})
+        if method in ('get', 'delete'):
+            request = getattr(self.factory, method)(
+                path, data, headers=headers
+            )
+        else:
+            request = getattr(self.factory, method)(
+                path, data, content_type='application/json', headers=headers
+            )
+        return await view(request, **kwargs)
+
+    async def test_list_matches_sync_view(self):
+        url = reverse('list_todos')
+        params = {'page_size': 2, 'fields': 'id,name', 'include': 'items'}
+        expected = await sync_to_async(self.client.get)(url, params)
+        response = await self.call(async_views.list_todos, 'get', url, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), expected.data)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    @override_settings(CACHES=SHARED_CACHES, TODOS_LIST_CACHE_TIMEOUT=300)
+    async def test_list_is_cached_and_revalidated(self):
+        await cache.aclear()
+        url = reverse('list_todos')
+        first = await self.call(async_views.list_todos, 'get', url)
+        headers = {'Authorization': self.auth, 'If-None-Match': first['ETag']}
+        second = await self.call(
+            async_views.list_todos, 'get', url, headers=headers
+        )
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_list_stream(self):
+        response = await self.call(
+            async_views.list_todos,
+            'get',
+            reverse('list_todos'),
+            {'stream': 'ndjson'},
+        )
+        content = b''.join([chunk async for chunk in response])
+
+        lines = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [todo['id'] for todo in lines], [todo.pk for todo in self.todos]
+        )
+
+    async def test_patch_item(self):
+        url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+        response = await self.call(
+            async_views.todo_item,
+            'patch',
+            url,
+            {'is_complete': True},
+            id=self.todo.pk,
+            iid=self.item.pk,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = await TodoItem.objects.aget(pk=self.item.pk)
+        self.assertTrue(item.is_complete)
+
+    async def test_stats_match_sync_view(self):
+        url = reverse('todo_stats')
+        expected = await sync_to_async(self.client.get)(url)
+        response = await self.call(async_views.todo_stats, 'get', url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), expected.data)
+
+    async def test_requires_authentication(self):
+        response = await self.call(
+            async_views.list_todos, 'get', reverse('list_todos'), headers={}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    async def test_invalid_token(self):
+        response = await self.call(
+            async_views.list_todos,
+            'get',
+            reverse('list_todos'),
+            headers={'Authorization': 'Token nope'},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            json.loads(response.content), {'detail': 'Invalid token.'}
+        )
+
+    async def test_checks_permissions_of_sync_view(self):
+        cls = views.todo_stats.cls
+        with mock.patch.object(cls, 'permission_classes', [IsAdminUser]):
+            response = await self.call(
+                async_views.todo_stats, 'get', reverse('todo_stats')
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_checks_throttles_of_sync_view(self):
+        class OncePerMinute(UserRateThrottle):
+            rate = '1/min'
+
+        cls = views.todo_stats.cls
+        url = reverse('todo_stats')
+        with mock.patch.object(cls, 'throttle_classes', [OncePerMinute]):
+            first = await self.call(async_views.todo_stats, 'get', url)
+            second = await self.call(async_views.todo_stats, 'get', url)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            second.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertIn('Retry-After', second)
+
+    async def test_create_update_and_delete_todo(self):
+        response = await self.call(
+            async_views.list_todos,
+            'post',
+            reverse('list_todos'),
+            {'name': 'new'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        todo_id = json.loads(response.content)['id']
+        url = reverse('todo', kwargs={'id': todo_id})
+
+        response = await self.call(
+            async_views.todo, 'put', url, {'name': 'renamed'}, id=todo_id
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        todo = await Todo.objects.aget(id=todo_id)
+        self.assertEqual(todo.name, 'renamed')
+
+        response = await self.call(async_views.todo, 'delete', url, id=todo_id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(await Todo.objects.filter(id=todo_id).aexists())
+
+    async def test_todo_of_another_user(self):
+        todo_id = self.other_todo.pk
+        response = await self.call(
+            async_views.todo,
+            'get',
+            reverse('todo', kwargs={'id': todo_id}),
+            id=todo_id,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_missing_todo(self):
+        response = await self.call(
+            async_views.todo, 'get', reverse('todo', kwargs={'id': 0}), id=0
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_item_list_matches_sync_view(self):
+        url = reverse('create_todo_item', kwargs={'id': self.todo.pk})
+        params = {'is_complete': 'false', 'ordering': '-id'}
+        expected = await sync_to_async(self.client.get)(url, params)
+        response = await self.call(
+            async_views.create_todo_item, 'get', url, params, id=self.todo.pk
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), expected.data)
+
+    async def test_items(self):
+        todo_id = self.todo.pk
+        response = await self.call(
+            async_views.create_todo_item,
+            'post',
+            reverse('create_todo_item', kwargs={'id': todo_id}),
+            {'name': 'second'},
+            id=todo_id,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        url = reverse('todo_item', kwargs={'id': todo_id, 'iid': self.item.pk})
+        response = await self.call(
+            async_views.todo_item,
+            'put',
+            url,
+            {'name': 'item', 'is_complete': True},
+            id=todo_id,
+            iid=self.item.pk,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = await self.call(
+            async_views.todo_item, 'get', url, id=todo_id, iid=self.item.pk
+        )
+        self.assertTrue(json.loads(response.content)['is_complete'])
+
+        response = await self.call(
+            async_views.todo_item,
+            'get',
+            url,
+            id=self.todos[1].pk,
+            iid=self.item.pk,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_invalid_data(self):
+        response = await self.call(
+            async_views.list_todos, 'post', reverse('list_todos'), {}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', json.loads(response.content))
+
+    @override_settings(QUERY_COUNT_HEADERS=True)
+    async def test_query_count_headers_under_asgi(self):
+        url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+        response = await self.async_client.get(
+            url, headers={'Authorization': self.auth}
+        )
+        self.assertEqual(response['X-DB-Query-Count'], '2')
+
+
+class BenchmarkServersCommandTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        Todo.objects.create(name='todo', user=self.user)
+
+    @mock.patch('subprocess.Popen')
+    @mock.patch('importlib.util.find_spec', return_value=None)
+    def test_missing_asgi_worker(self, find_spec, popen):
+        with self.assertRaisesMessage(CommandError, 'uvicorn-worker'):
+            call_command('benchmark_servers', 'foo', stdout=StringIO())
+
+        find_spec.assert_called_once_with('uvicorn_worker')
+        popen.assert_not_called()
+
+
+class BootTestCase(APITestCase):
+    """``todoapi.boot``, which gunicorn runs before starting workers."""
+
+    def setUp(self):
+        self.static_root = Path(tempfile.mkdtemp())
+        self.static_dir = Path(tempfile.mkdtemp())
+        (self.static_dir / 'app.css').write_text('body {}')
+        overrides = override_settings(
+            STATIC_ROOT=self.static_root, STATICFILES_DIRS=[self.static_dir]
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def prepare(self, **kwargs):
+        with mock.patch('django.core.management.call_command') as command:
+            boot.prepare(log=lambda message: None, **kwargs)
+        return [call.args[0] for call in command.call_args_list]
+
+    def test_unapplied_migrations(self):
+        self.assertEqual(boot.unapplied_migrations(connection), set())
+
+        MigrationRecorder(connection).record_unapplied('todos', '0001_initial')
+
+        self.assertEqual(
+            boot.unapplied_migrations(connection), {('todos', '0001_initial')}
+        )
+
+    def test_unapplied_migrations_without_table(self):
+        with mock.patch.object(
+            MigrationRecorder, 'has_table', return_value=False
+        ):
+            unapplied = boot.unapplied_migrations(connection)
+
+        self.assertIn(('todos', '0001_initial'), unapplied)
+        self.assertIn(('accounts', '0001_initial'), unapplied)
+
+    def test_static_fingerprint(self):
+        fingerprint = boot.static_fingerprint()
+        self.assertEqual(boot.static_fingerprint(), fingerprint)
+
+        (self.static_dir / 'app.css').write_text('body { margin: 0 }')
+        changed = boot.static_fingerprint()
+        self.assertNotEqual(changed, fingerprint)
+
+        (self.static_dir / 'app.js').write_text('')
+        self.assertNotEqual(boot.static_fingerprint(), changed)
+
+    def test_prepare_collects_changed_static_files(self):
+        self.assertEqual(self.prepare(), ['collectstatic'])
+        self.assertEqual(
+            (self.static_root / boot.STATIC_FINGERPRINT_FILE).read_text(),
+            boot.static_fingerprint() + '\n',
+        )
+
+        self.assertEqual(self.prepare(), [])
+
+        (self.static_dir / 'app.css').write_text('body { margin: 0 }')
+        self.assertEqual(self.prepare(), ['collectstatic'])
+
+    def test_prepare_migrates_when_needed(self):
+        boot.collect_static(log=lambda message: None)
+        unapplied = {('todos', '0001_initial')}
+
+        with mock.patch.object(
+            boot, 'unapplied_migrations', return_value=unapplied
+        ) as probe:
+            self.assertEqual(self.prepare(), ['migrate'])
+            self.assertEqual(self.prepare(migrate=False), [])
+
+        probe.assert_called_once()
+
+
+class GunicornConfigTestCase(APITestCase):
+    def setUp(self):
+        spec = importlib.util.spec_from_file_location(
+            'gunicorn_conf', settings.BASE_DIR / 'gunicorn.conf.py'
+        )
+        assert spec is not None and spec.loader is not None
+        self.conf = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.conf)
+
+    def test_available_cpus_honours_cgroup_quota(self):
+        for quota, cpus in (('200000 100000', 2), ('max 100000', 4)):
+            with (
+                self.subTest(quota=quota),
+                mock.patch('os.sched_getaffinity', return_value={0, 1, 2, 3}),
+                mock.patch.object(self.conf, '_read', return_value=quota),
+            ):
+                self.assertEqual(self.conf.available_cpus(), cpus)
+
+    def test_available_memory_from_cgroup(self):
+        with mock.patch.object(
+            self.conf, '_read', return_value=str(512 * 1024 * 1024)
+        ):
+            self.assertEqual(self.conf.available_memory_mb(), 512)
+
+    def test_default_workers(self):
+        for cpus, memory, workers in (
+            (2, None, 5),
+            (2, 4096, 5),
+            (2, 512, 2),
+            (4, 128, 1),
+        ):
+            with (
+                self.subTest(cpus=cpus, memory=memory),
+                mock.patch.object(
+                    self.conf, 'available_cpus', return_value=cpus
+                ),
+                mock.patch.object(
+                    self.conf, 'available_memory_mb', return_value=memory
+                ),
+            ):
+                self.assertEqual(self.conf.default_workers(), workers)
+
+    def test_when_ready_prepares_the_boot(self):
+        server = mock.Mock()
+        server.cfg.preload_app = True
+
+        with mock.patch.object(boot, 'prepare') as prepare:
+            self.conf.when_ready(server)
+            prepare.assert_not_called()
+
+            self.conf.BOOT_PREPARE = True
+            self.conf.BOOT_MIGRATE = False
+            self.conf.when_ready(server)
+
+        prepare.assert_called_once_with(log=server.log.info, migrate=False)
+
+
+class OpenAPISchemaTestCase(APITestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        cached_schema.clear()
+        self.addCleanup(cached_schema.clear)
+
+    def test_committed_schema_is_up_to_date(self):
+        # Regenerate with `python manage.py spectacular --file schema.yml`.
+        with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as f:
+            committed = yaml.safe_load(f)
+        generated = json.loads(
+            json.dumps(SchemaGenerator().get_schema(request=None, public=True))
+        )
+        self.assertEqual(committed, generated)
+
+    def test_serves_gzipped_yaml_with_etag(self):
+        request = self.factory.get('/api/schema/', HTTP_ACCEPT_ENCODING='gzip')
+        response = schema_view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        schema = yaml.safe_load(gzip.decompress(response.content))
+        self.assertEqual(schema['info']['title'], 'TodoAPI')
+
+        request = self.factory.get(
+            '/api/schema/', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(
+            schema_view(request).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_serves_json(self):
+        response = schema_view(
+            self.factory.get('/api/schema/', {'format': 'json'})
+        )
+
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('/todos/', json.loads(response.content)['paths'])
+
+    @override_settings(OPENAPI_SCHEMA_FILE='')
+    def test_generates_schema_without_file(self):
+        with mock.patch.object(
+            SchemaGenerator, 'get_schema', return_value={'openapi': '3.0.3'}
+        ) as get_schema:
+            schema_view(self.factory.get('/api/schema/'))
+            response = schema_view(self.factory.get('/api/schema/'))
+
+        get_schema.assert_called_once()
+        self.assertEqual(
+            yaml.safe_load(response.content), {'openapi': '3.0.3'}
+        )
+
+
+class TodoRowsParityTestCase(APITestCase):
+    """
+    The values() fast path renders exactly what TodoSerializer does.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        for i in range(3):
+            todo = Todo.objects.create(
+                name=f'todo{i} ✓', user=self.user, description=f'd{i}'
+            )
+            for j in range(i):
+                TodoItem.objects.create(
+                    name=f'item{j}', todo=todo, is_complete=j % 2 == 0
+                )
+        # isoformat() leaves out zero microseconds.
+        Todo.objects.filter(pk=todo.pk).update(
+            updated_at=todo.updated_at.replace(microsecond=0)
+        )
+        self.todos = Todo.objects.filter(user=self.user).order_by('id')
+
+    def assertRendersLikeSerializer(self, fieldset):
+        todos = self.todos.prefetch_related(
+            Prefetch('items', queryset=TodoItem.objects.order_by('id'))
+        )
+        expected = TodoSerializer(todos, many=True, fields=fieldset).data
+        rows = serialize_rows(todo_rows(self.todos, fieldset), fieldset)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(rows), renderer.render(expected))
+
+    def test_full_representation(self):
+        self.assertRendersLikeSerializer(None)
+
+    def test_fieldsets(self):
+        for fieldset in (
+            ('id', 'name'),
+            ('updated_at', 'id'),
+            ('name', 'items'),
+            ('items',),
+        ):
+            with self.subTest(fieldset=fieldset):
+                self.assertRendersLikeSerializer(fieldset)
+
+    def test_other_timezone(self):
+        with timezone.override('Asia/Kolkata'):
+            self.assertRendersLikeSerializer(None)
+
+    def test_items_in_one_query(self):
+        with self.assertNumQueries(2):
+            serialize_rows(todo_rows(self.todos))
+
+
+class TodoItemCountsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.items = [
+            TodoItem.objects.create(
+                name=f'item{i}', todo=self.todo, is_complete=i == 0
+            )
+            for i in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def assertCounts(self, todo, item_count, completed_count):
+        todo.refresh_from_db()
+        self.assertEqual(
+            (todo.item_count, todo.completed_count),
+            (item_count, completed_count),
+        )
+
+    def test_counts_in_representation(self):
+        response = self.client.get(
+            reverse('todo', kwargs={'id': self.todo.pk}),
+            {'fields': 'id,item_count,completed_count'},
+        )
+
+        self.assertEqual(
+            response.json(),
+            {'id': self.todo.pk, 'item_count': 3, 'completed_count': 1},
+        )
+
+    def test_item_views_maintain_counts(self):
+        self.client.post(
+            reverse('create_todo_item', kwargs={'id': self.todo.pk}),
+            data={'name': 'new', 'is_complete': True},
+        )
+        self.assertCounts(self.todo, 4, 2)
+
+        url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.items[0].pk}
+        )
+        self.client.put(url, data={'name': 'item0', 'is_complete': False})
+        self.assertCounts(self.todo, 4, 1)
+        self.client.put(url, data={'name': 'renamed', 'is_complete': False})
+        self.assertCounts(self.todo, 4, 1)
+
+        self.client.delete(url)
+        self.assertCounts(self.todo, 3, 1)
+
+    def test_stale_instances(self):
+        # Two requests load the same item before either saves it.
+        first = TodoItem.objects.get(pk=self.items[1].pk)
+        second = TodoItem.objects.get(pk=self.items[1].pk)
+        first.is_complete = second.is_complete = True
+        first.save()
+        second.save()
+
+        self.assertCounts(self.todo, 3, 2)
+        self.assertEqual(
+            TodoStats.objects.get(pk=self.user.pk).completed_count, 2
+        )
+
+        # Deleted twice, and completed after both were loaded.
+        first = TodoItem.objects.get(pk=self.items[2].pk)
+        second = TodoItem.objects.get(pk=self.items[2].pk)
+        self.client.patch(
+            reverse(
+                'todo_item',
+                kwargs={'id': self.todo.pk, 'iid': self.items[2].pk},
+            ),
+            data={'is_complete': True},
+        )
+        first.delete()
+        second.delete()
+
+        self.assertCounts(self.todo, 2, 2)
+        self.assertEqual(
+            TodoStats.objects.get(pk=self.user.pk).completed_count, 2
+        )
+
+    def test_bulk_maintains_counts(self):
+        response = self.client.post(
+            reverse('bulk_todo_items', kwargs={'id': self.todo.pk}),
+            data={
+                'create': [
+                    {'name': 'new', 'is_complete': True},
+                    {'name': 'newer'},
+                ],
+                'update': [{'id': self.items[1].pk, 'is_complete': True}],
+                'delete': [self.items[0].pk],
+            },
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(self.todo, 4, 2)
+
+    def test_admin_inline_maintains_counts(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@bar.com', password='bar'
+        )
+        self.client.force_login(admin)
+        data = {
+            'name': 'todo',
+            'user': self.user.pk,
+            'description': 'todo',
+            'items-TOTAL_FORMS': 4,
+            'items-INITIAL_FORMS': 3,
+            'items-MIN_NUM_FORMS': 0,
+            'items-MAX_NUM_FORMS': 1000,
+            'items-3-name': 'new',
+            'items-3-is_complete': 'on',
+        }
+        for i, item in enumerate(self.items):
+            data.update({
+                f'items-{i}-id': item.pk,
+                f'items-{i}-todo': self.todo.pk,
+                f'items-{i}-name': item.name,
+            })
+        data['items-1-is_complete'] = 'on'
+        data['items-2-DELETE'] = 'on'
+
+        response = self.client.post(
+            reverse('admin:todos_todo_change', args=[self.todo.pk]), data
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertCounts(self.todo, 3, 2)
+
+    def test_saving_a_stale_todo_keeps_counts(self):
+        stale = Todo.objects.get(pk=self.todo.pk)
+        TodoItem.objects.create(name='new', todo=self.todo)
+
+        stale.name = 'renamed'
+        stale.save()
+
+        self.assertCounts(self.todo, 4, 1)
+
+    def test_moving_an_item_moves_its_counts(self):
+        other = Todo.objects.create(name='other', user=self.user)
+        item = TodoItem.objects.get(pk=self.items[0].pk)
+
+        item.todo = other
+        item.save(update_fields=['todo'])
+
+        self.assertCounts(self.todo, 2, 0)
+        self.assertCounts(other, 1, 1)
+
+    def test_import_sets_counts(self):
+        lines = [
+            json.dumps({'type': 'todo', 'id': 1, 'name': 'imported'}),
+            json.dumps({'type': 'item', 'todo': 1, 'name': 'a'}),
+            json.dumps(
+                {'type': 'item', 'todo': 1, 'name': 'b', 'is_complete': True}
+            ),
+        ]
+
+        self.client.post(
+            reverse('import_todos'),
+            data='\n'.join(lines),
+            content_type='application/x-ndjson',
+        )
+
+        self.assertCounts(Todo.objects.get(name='imported'), 2, 1)
+
+    def test_repair_command(self):
+        Todo.objects.filter(pk=self.todo.pk).update(
+            item_count=7, completed_count=0
+        )
+        healthy = Todo.objects.create(name='healthy', user=self.user)
+        updated_at = Todo.objects.get(pk=healthy.pk).updated_at
+
+        stdout = StringIO()
+        call_command('repair_todo_counts', batch_size=1, stdout=stdout)
+
+        self.assertIn('1 of 2 todos repaired.', stdout.getvalue())
+        self.assertCounts(self.todo, 3, 1)
+        healthy.refresh_from_db()
+        self.assertEqual(healthy.updated_at, updated_at)
+
+
+class TodoItemCountsTransactionTestCase(TransactionTestCase):
+    """Writes outside of any transaction, as under autocommit."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+
+    def test_counts_are_written_with_the_item(self):
+        pk = self.item.pk
+        self.item.is_complete = True
+        with mock.patch.object(
+            TodoStats.objects, 'shift', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.item.save()
+            with self.assertRaises(RuntimeError):
+                self.item.delete()
+
+        self.assertFalse(TodoItem.objects.get(pk=pk).is_complete)
+        self.todo.refresh_from_db()
+        self.assertEqual(
+            (self.todo.item_count, self.todo.completed_count), (1, 0)
+        )
+
+
+class TodoStatsAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.stats_url = reverse('todo_stats')
+
+    def get_stats(self):
+        response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def assertStatsMatchData(self):
+        stats = TodoStats.objects.get(pk=self.user.pk)
+        rebuilt = TodoStats.objects.totals([self.user.pk])[self.user.pk]
+        self.assertEqual(
+            (stats.todo_count, stats.item_count, stats.completed_count),
+            (rebuilt.todo_count, rebuilt.item_count, rebuilt.completed_count),
+        )
+
+    def test_stale_instances_keep_stats(self):
+        todo = Todo.objects.create(name='todo', user=self.user)
+        item = TodoItem.objects.create(name='item', todo=todo)
+        # Loaded before the item was completed and another one added.
+        stale_todo = Todo.objects.get(pk=todo.pk)
+        stale_item = TodoItem.objects.get(pk=item.pk)
+        TodoItem.objects.patch(item.pk, todo.pk, self.user.pk, is_complete=True)
+        TodoItem.objects.create(name='other', todo=todo)
+
+        stale_item.is_complete = True
+        stale_item.save()
+        self.assertStatsMatchData()
+
+        stale_todo.delete()
+        self.assertStatsMatchData()
+        self.assertEqual(
+            TodoStats.objects.filter(pk=self.user.pk).values_list(
+                *STATS_FIELDS
+            ).get(),
+            (0, 0, 0),
+        )
+
+    def test_unauthorized_stats(self):
+        response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats(self):
+        todo = Todo.objects.create(name='todo', user=self.user)
+        for i in range(4):
+            TodoItem.objects.create(
+                name=f'item{i}', todo=todo, is_complete=i == 0
+            )
+        Todo.objects.create(name='empty', user=self.user)
+        self.client.force_authenticate(self.user)  # type: ignore
+
+        self.assertEqual(
+            self.get_stats(),
+            {
+                'todo_count': 2,
+                'item_count': 4,
+                'completed_count': 1,
+                'completion_rate': 0.25,
+            },
+        )
+
+    def test_stats_without_todos(self):
+        TodoStats.objects.filter(pk=self.user.pk).delete()
+        self.client.force_authenticate(self.user)  # type: ignore
+
+        self.assertEqual(
+            self.get_stats(),
+            {
+                'todo_count': 0,
+                'item_count': 0,
+                'completed_count': 0,
+                'completion_rate': 0.0,
+            },
+        )
+        self.assertTrue(TodoStats.objects.filter(pk=self.user.pk).exists())
+
+    def test_stats_are_a_primary_key_read(self):
+        TodoStats.objects.rebuild(self.user.pk)
+        self.client.force_authenticate(self.user)  # type: ignore
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get_stats()
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('todos_todostats', queries[0]['sql'])
+
+    def test_stats_follow_changes(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('list_todos'), data={'name': 'todo'})
+        todo = Todo.objects.get(name='todo')
+        other = Todo.objects.create(name='other', user=self.user)
+        TodoItem.objects.create(name='item', todo=other, is_complete=True)
+        self.client.post(
+            reverse('create_todo_item', kwargs={'id': todo.pk}),
+            data={'name': 'item'},
+        )
+        item = todo.items.get()
+        self.client.put(
+            reverse('todo_item', kwargs={'id': todo.pk, 'iid': item.pk}),
+            data={'name': 'item', 'is_complete': True},
+        )
+        self.client.post(
+            reverse('bulk_todo_items', kwargs={'id': todo.pk}),
+            data={'create': [{'name': 'a'}, {'name': 'b'}]},
+            format='json',
+        )
+        self.assertStatsMatchData()
+        self.assertEqual(self.get_stats()['item_count'], 4)
+
+        self.client.delete(reverse('todo', kwargs={'id': other.pk}))
+        self.assertStatsMatchData()
+        self.assertEqual(
+            self.get_stats(),
+            {
+                'todo_count': 1,
+                'item_count': 3,
+                'completed_count': 1,
+                'completion_rate': 1 / 3,
+            },
+        )
+
+    def test_rebuild_command(self):
+        todo = Todo.objects.create(name='todo', user=self.user)
+        TodoItem.objects.create(name='item', todo=todo, is_complete=True)
+        TodoStats.objects.filter(pk=self.user.pk).update(
+            todo_count=5, item_count=0
+        )
+
+        stdout = StringIO()
+        call_command('rebuild_todo_stats', batch_size=1, stdout=stdout)
+
+        self.assertIn('Rebuilt the stats of 1 users.', stdout.getvalue())
+        self.assertStatsMatchData()
+
+
+# Overlapping syncs are tested explicitly.
+@override_settings(TODOS_CHANGES_OVERLAP=0)
+class TodoChangesAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.changes_url = reverse('todo_changes')
+        self.client.force_login(self.user)
+
+    def changes(self, since=None):
+        params = {} if since is None else {'since': since}
+        response = self.client.get(self.changes_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def sync(self):
+        return self.changes()['token']
+
+    def test_unauthorized_changes(self):
+        self.client.logout()
+        response = self.client.get(self.changes_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_sync(self):
+        data = self.changes()
+
+        self.assertEqual(
+            [todo['id'] for todo in data['todos']], [self.todo.pk]
+        )
+        self.assertNotIn('items', data['todos'][0])
+        self.assertEqual(data['todos'][0]['item_count'], 1)
+        self.assertEqual([item['id'] for item in data['items']], [self.item.pk])
+        self.assertEqual(data['deleted'], {'todos': [], 'items': []})
+
+    def test_changes_since_token(self):
+        unchanged = Todo.objects.create(name='unchanged', user=self.user)
+        TodoItem.objects.create(name='unchanged', todo=unchanged)
+        token = self.sync()
+
+        item_url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+        self.client.put(item_url, data={'name': 'renamed'})
+        created = Todo.objects.create(name='new', user=self.user)
+        data = self.changes(token)
+
+        self.assertEqual(
+            [todo['id'] for todo in data['todos']], [self.todo.pk, created.pk]
+        )
+        self.assertEqual(
+            [(item['id'], item['name']) for item in data['items']],
+            [(self.item.pk, 'renamed')],
+        )
+        self.assertEqual(data['deleted'], {'todos': [], 'items': []})
+
+    def test_deletions_leave_tombstones(self):
+        other = Todo.objects.create(name='other', user=self.user)
+        items = [
+            TodoItem.objects.create(name=f'item{i}', todo=other)
+            for i in range(2)
+        ]
+        token = self.sync()
+
+        self.client.delete(
+            reverse('todo_item', kwargs={'id': other.pk, 'iid': items[0].pk})
+        )
+        self.client.post(
+            reverse('bulk_todo_items', kwargs={'id': other.pk}),
+            data={'delete': [items[1].pk]},
+            format='json',
+        )
+        self.client.delete(reverse('todo', kwargs={'id': self.todo.pk}))
+        data = self.changes(token)
+
+        self.assertEqual(
+            data['deleted'],
+            {'todos': [self.todo.pk], 'items': [item.pk for item in items]},
+        )
+        self.assertEqual([todo['id'] for todo in data['todos']], [other.pk])
+        self.assertEqual(data['items'], [])
+
+    def test_tombstones_hold_big_ids(self):
+        # Ids are BigAutoField; SQLite would not notice a narrower column.
+        field = Tombstone._meta.get_field('object_id')
+        self.assertIsInstance(field, models.BigIntegerField)
+
+        todo = Todo.objects.create(id=2**40, name='big', user=self.user)
+        item = TodoItem.objects.create(id=2**40 + 1, name='big', todo=todo)
+        token = self.sync()
+
+        item.delete()
+        todo.delete()
+
+        self.assertEqual(
+            self.changes(token)['deleted'],
+            {'todos': [2**40], 'items': [2**40 + 1]},
+        )
+
+    def test_other_users_changes_are_hidden(self):
+        other_user = User.objects.create_user(
+            username='bar', email='bar@foo.com', password='foo'
+        )
+        other = Todo.objects.create(name='other', user=other_user)
+        TodoItem.objects.create(name='other', todo=other)
+        other.delete()
+
+        data = self.changes()
+
+        self.assertEqual([todo['id'] for todo in data['todos']], [self.todo.pk])
+        self.assertEqual([item['id'] for item in data['items']], [self.item.pk])
+        self.assertEqual(data['deleted'], {'todos': [], 'items': []})
+
+    def test_invalid_token(self):
+        position = make_token(timezone.now()).split('.')[0]
+        for token in ('nope', position, f'{position}.1.2', f'{"9" * 30}.1'):
+            with self.subTest(token=token):
+                response = self.client.get(self.changes_url, {'since': token})
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+
+    def test_token_is_the_latest_change_sent(self):
+        latest = Todo.objects.create(name='latest', user=self.user)
+        Todo.objects.filter(pk=latest.pk).update(
+            updated_at=timezone.now() + timedelta(hours=1)
+        )
+        latest.refresh_from_db()
+
+        position, issued = parse_token(self.sync())
+
+        self.assertEqual(position, latest.updated_at)
+        self.assertLess(issued, latest.updated_at)
+
+    def test_token_does_not_move_without_changes(self):
+        token = self.sync()
+        position, _ = parse_token(token)
+
+        next_token = self.changes(token)['token']
+        self.assertEqual(parse_token(next_token)[0], position)
+
+    def test_overlap_covers_late_commits(self):
+        token = self.sync()
+        position, _ = parse_token(token)
+        # Committed after the sync, with a timestamp from before it.
+        late = Todo.objects.create(name='late', user=self.user)
+        Todo.objects.filter(pk=late.pk).update(
+            updated_at=position - timedelta(seconds=2)
+        )
+
+        self.assertEqual(self.changes(token)['todos'], [])
+        with self.settings(TODOS_CHANGES_OVERLAP=5):
+            data = self.changes(token)
+        self.assertIn(late.pk, [todo['id'] for todo in data['todos']])
+
+    def test_import_resets_tokens(self):
+        token = self.sync()
+
+        self.client.post(
+            reverse('import_todos'),
+            data=b'{"type": "todo", "id": 1, "name": "imported"}\n',
+            content_type='application/x-ndjson',
+        )
+
+        response = self.client.get(self.changes_url, {'since': token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertIn('imported', response.json()['error'])
+
+        # A full sync picks the import up, and its token is past the reset.
+        data = self.changes()
+        self.assertEqual(len(data['todos']), 2)
+        self.assertEqual(self.changes(data['token'])['todos'], [])
+
+    def test_quiet_account_token_does_not_expire(self):
+        Todo.objects.filter(pk=self.todo.pk).update(
+            updated_at=timezone.now() - timedelta(days=60)
+        )
+        TodoItem.objects.filter(pk=self.item.pk).update(
+            updated_at=timezone.now() - timedelta(days=60)
+        )
+        token = self.sync()
+
+        self.assertEqual(self.changes(token)['todos'], [])
+
+    def test_expired_token(self):
+        two_days_ago = timezone.now() - timedelta(days=2)
+        token = make_token(two_days_ago, two_days_ago)
+        with override_settings(TODOS_TOMBSTONE_RETENTION_DAYS=1):
+            response = self.client.get(self.changes_url, {'since': token})
+
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_prune_command(self):
+        self.todo.delete()
+        Tombstone.objects.create(
+            user=self.user,
+            kind=Tombstone.ITEM,
+            object_id=1,
+            deleted_at=timezone.now() - timedelta(days=31),
+        )
+
+        stdout = StringIO()
+        call_command('prune_tombstones', batch_size=1, stdout=stdout)
+
+        self.assertIn('Pruned 1 tombstones.', stdout.getvalue())
+        self.assertEqual(
+            list(Tombstone.objects.values_list('kind', flat=True)),
+            [Tombstone.TODO],
+        )
+
+
+class TodoEventsTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.token = Token.objects.create(user=self.user)
+        self.broker = events.InProcessBroker()
+        patcher = mock.patch.object(
+            events, 'get_broker', return_value=self.broker
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def parse(self, message):
+        lines = message.decode().strip().splitlines()
+        fields = dict(line.split(': ', 1) for line in lines)
+        return fields['event'], json.loads(fields['data'])
+
+    def published(self, func, *args, **kwargs):
+        with mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                func(*args, **kwargs)
+        return [call.args for call in publish.call_args_list]
+
+    def test_write_paths_publish_on_commit(self):
+        self.client.force_login(self.user)
+        item_url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+
+        self.assertEqual(
+            self.published(self.client.put, item_url, data={'name': 'new'}),
+            [(
+                self.user.pk,
+                {
+                    'type': 'item',
+                    'action': 'saved',
+                    'ids': [self.item.pk],
+                    'todo': self.todo.pk,
+                },
+            )],
+        )
+        self.assertEqual(
+            self.published(
+                self.client.post,
+                reverse('bulk_todo_items', kwargs={'id': self.todo.pk}),
+                data={'delete': [self.item.pk]},
+                format='json',
+            ),
+            [(
+                self.user.pk,
+                {
+                    'type': 'item',
+                    'action': 'deleted',
+                    'ids': [self.item.pk],
+                    'todo': self.todo.pk,
+                },
+            )],
+        )
+        self.assertEqual(
+            self.published(
+                self.client.delete, reverse('todo', kwargs={'id': self.todo.pk})
+            ),
+            [(
+                self.user.pk,
+                {'type': 'todo', 'action': 'deleted', 'ids': [self.todo.pk]},
+            )],
+        )
+
+    def test_rolled_back_writes_publish_nothing(self):
+        with mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        self.todo.save()
+                        raise ValueError
+                except ValueError:
+                    pass
+
+        publish.assert_not_called()
+
+    async def test_subscription_gets_events_from_other_threads(self):
+        subscription = self.broker.subscribe(self.user.pk)
+        event = {'type': 'todo', 'action': 'saved', 'ids': [1]}
+
+        await sync_to_async(self.broker.publish)(self.user.pk, event)
+        await sync_to_async(self.broker.publish)(self.user.pk + 1, event)
+
+        message = await subscription.get(timeout=1)
+        self.assertEqual(self.parse(message), ('todo', event))
+        self.assertIsNone(await subscription.get(timeout=0.01))
+
+        self.broker.unsubscribe(subscription)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    def test_events_carry_no_change_token(self):
+        self.assertEqual(
+            events.encode({'type': 'resync'}),
+            b'event: resync\ndata: {"type":"resync"}\n\n',
+        )
+
+    def test_publish_without_subscribers_skips_encoding(self):
+        with mock.patch.object(events, 'encode') as encode:
+            self.broker.publish(self.user.pk, {'type': 'resync'})
+        encode.assert_not_called()
+
+    @override_settings(TODOS_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_subscriber_is_told_to_resync(self):
+        subscription = self.broker.subscribe(self.user.pk)
+        for i in range(3):
+            self.broker.publish(
+                self.user.pk, {'type': 'todo', 'action': 'saved', 'ids': [i]}
+            )
+        await asyncio.sleep(0)
+
+        message = await subscription.get(timeout=1)
+        self.assertEqual(self.parse(message), ('resync', {'type': 'resync'}))
+        self.assertIsNone(await subscription.get(timeout=0.01))
+
+    @override_settings(TODOS_EVENTS_HEARTBEAT=0.01)
+    async def test_event_stream(self):
+        request = AsyncRequestFactory().get(
+            reverse('todo_events'),
+            headers={'Authorization': 'Token ' + self.token.key},
+        )
+        response = await async_views.todo_events(request)
+        content = aiter(response)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(await anext(content), events.HEARTBEAT)
+
+        event = {'type': 'todo', 'action': 'saved', 'ids': [self.todo.pk]}
+        self.broker.publish(self.user.pk, event)
+        self.assertEqual(self.parse(await anext(content)), ('todo', event))
+
+        # What the ASGI handler does when the client disconnects.
+        reading = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        reading.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reading
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    async def test_event_stream_requires_authentication(self):
+        request = AsyncRequestFactory().get(reverse('todo_events'))
+        response = await async_views.todo_events(request)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+    def test_event_stream_needs_asgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('todo_events'))
+
+        self.assertEqual(
+            response.status_code, status.HTTP_501_NOT_IMPLEMENTED
+        )
+
+
+class TodoPatchAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(
+            name='todo', description='lorem', user=self.user
+        )
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.todo_url = reverse('todo', kwargs={'id': self.todo.pk})
+        self.item_url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+        self.client.force_authenticate(self.user)  # type: ignore
+
+    def test_patch_todo(self):
+        response = self.client.patch(self.todo_url, data={'name': 'new'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.todo.refresh_from_db()
+        self.assertEqual(
+            (self.todo.name, self.todo.description), ('new', 'lorem')
+        )
+
+    def test_patch_item_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                self.item_url, data={'is_complete': True}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statements = [query['sql'] for query in queries]
+        self.assertFalse(
+            [sql for sql in statements if sql.startswith('SELECT')]
+        )
+        self.assertEqual(
+            len([sql for sql in statements if 'todos_todoitem' in sql]), 1
+        )
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.name, self.item.is_complete), ('item', True))
+
+    def test_patch_item_keeps_counts(self):
+        for is_complete, completed_count in (
+            (True, 1), (True, 1), (False, 0), (False, 0)
+        ):
+            self.client.patch(self.item_url, data={'is_complete': is_complete})
+            self.todo.refresh_from_db()
+            self.assertEqual(self.todo.completed_count, completed_count)
+            self.assertEqual(
+                TodoStats.objects.get(pk=self.user.pk).completed_count,
+                completed_count,
+            )
+
+    def test_patch_item_bumps_todo(self):
+        updated_at = self.todo.updated_at
+
+        self.client.patch(self.item_url, data={'name': 'new'})
+
+        self.todo.refresh_from_db()
+        self.assertGreater(self.todo.updated_at, updated_at)
+        self.assertEqual(TodoItem.objects.get(pk=self.item.pk).name, 'new')
+
+    def test_patch_invalid_data(self):
+        response = self.client.patch(self.item_url, data={'name': ''})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_patch_missing_objects(self):
+        other_user = User.objects.create_user(
+            username='bar', email='bar@foo.com', password='foo'
+        )
+        other = Todo.objects.create(name='other', user=other_user)
+        other_item = TodoItem.objects.create(name='other', todo=other)
+
+        cases = [
+            (reverse('todo', kwargs={'id': 0}), 404),
+            (reverse('todo', kwargs={'id': other.pk}), 403),
+            (reverse('todo_item', kwargs={'id': 0, 'iid': 0}), 404),
+            (
+                reverse(
+                    'todo_item', kwargs={'id': other.pk, 'iid': other_item.pk}
+                ),
+                403,
+            ),
+            (
+                reverse('todo_item', kwargs={'id': self.todo.pk, 'iid': 0}),
+                404,
+            ),
+            (
+                reverse(
+                    'todo_item',
+                    kwargs={'id': self.todo.pk, 'iid': other_item.pk},
+                ),
+                400,
+            ),
+        ]
+        for url, status_code in cases:
+            with self.subTest(url=url):
+                response = self.client.patch(url, data={'name': 'new'})
+                self.assertEqual(response.status_code, status_code)
+        self.assertEqual(TodoItem.objects.get(pk=other_item.pk).name, 'other')
+
+
+class TodoOwnershipLookupTestCase(APITestCase):
+    """
+    Views find a todo or item and check its owner in a single query, and
+    only look further to explain a miss.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.other = User.objects.create_user(
+            username='bar', email='bar@foo.com', password='foo'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.item = TodoItem.objects.create(name='item', todo=self.todo)
+        self.other_todo = Todo.objects.create(name='other', user=self.other)
+        self.client.force_authenticate(self.user)  # type: ignore
+
+    def test_for_user(self):
+        self.assertEqual(
+            list(Todo.objects.for_user(self.user)), [self.todo]
+        )
+        self.assertEqual(
+            list(Todo.objects.for_user(self.other.pk)), [self.other_todo]
+        )
+
+    def test_item_for_user_is_one_query(self):
+        items = TodoItem.objects.for_user(self.user, todo_id=self.todo.pk)
+        with self.assertNumQueries(1):
+            item = items.get(pk=self.item.pk)
+            self.assertEqual(item.todo.user_id, self.user.pk)
+
+        self.assertFalse(
+            TodoItem.objects.for_user(self.other).filter(pk=self.item.pk)
+        )
+        self.assertFalse(
+            TodoItem.objects.for_user(
+                self.user, todo_id=self.other_todo.pk
+            ).filter(pk=self.item.pk)
+        )
+
+    def test_item_views_run_one_lookup(self):
+        url = reverse(
+            'todo_item', kwargs={'id': self.todo.pk, 'iid': self.item.pk}
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.put(url, data={'name': 'new'})
+        selects = [
+            query['sql']
+            for query in queries
+            if query['sql'].startswith('SELECT')
+        ]
+        # The lookup, then the lock of the item's row before it is saved.
+        self.assertEqual(len(selects), 2)
+        self.assertIn('INNER JOIN "todos_todo"', selects[0])
+
+    def test_todo_views_run_one_lookup(self):
+        url = reverse('create_todo_item', kwargs={'id': self.todo.pk})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, data={'name': 'new'})
+        selects = [
+            query['sql']
+            for query in queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(selects), 1)
+
+    def test_misses(self):
+        item_url = reverse(
+            'todo_item',
+            kwargs={'id': self.other_todo.pk, 'iid': self.item.pk},
+        )
+        cases = [
+            ('get', reverse('todo', kwargs={'id': 0}), 404),
+            ('get', reverse('todo', kwargs={'id': self.other_todo.pk}), 403),
+            ('post', reverse('create_todo_item', kwargs={'id': 0}), 404),
+            (
+                'post',
+                reverse('create_todo_item', kwargs={'id': self.other_todo.pk}),
+                403,
+            ),
+            (
+                'get',
+                reverse('todo_item', kwargs={'id': self.todo.pk, 'iid': 0}),
+                404,
+            ),
+            ('get', item_url, 403),
+            ('delete', item_url, 403),
+        ]
+        for method, url, status_code in cases:
+            with self.subTest(method=method, url=url):
+                response = getattr(self.client, method)(url)
+                self.assertEqual(response.status_code, status_code)
+        self.assertTrue(TodoItem.objects.filter(pk=self.item.pk).exists())
+
+
+class TodoItemListAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='foo', email='foo@bar.com', password='bar'
+        )
+        self.todo = Todo.objects.create(name='todo', user=self.user)
+        self.items = [
+            TodoItem.objects.create(
+                name=f'item{i}', todo=self.todo, is_complete=i % 3 == 0
+            )
+            for i in range(10)
+        ]
+        TodoItem.objects.create(
+            name='elsewhere',
+            todo=Todo.objects.create(name='other', user=self.user),
+        )
+        self.url = reverse('create_todo_item', kwargs={'id': self.todo.pk})
+        self.client.force_authenticate(self.user)  # type: ignore
+
+    def walk(self, params, cursor_key='next'):
+        """Follow the cursors from the first page and return every item id."""
+        ids = []
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item['id'] for item in response.data['results'])
+            if response.data[cursor_key] is None:
+                return ids, response
+            response = self.client.get(
+                self.url, {**params, 'cursor': response.data[cursor_key]}
+            )
+
+    def test_list_items(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            TodoItemSerializer(self.items, many=True).data,
+        )
+        self.assertIsNone(response.data['next'])
+        self.assertIsNone(response.data['prev'])
+
+    def test_pages(self):
+        ids, last = self.walk({'page_size': 3})
+        self.assertEqual(ids, [item.pk for item in self.items])
+
+        # And back from the last page.
+        response = self.client.get(
+            self.url, {'page_size': 3, 'cursor': last.data['prev']}
+        )
+        self.assertEqual(
+            [item['id'] for item in response.data['results']],
+            [item.pk for item in self.items[6:9]],
+        )
+
+    def test_newest_first(self):
+        ids, _ = self.walk({'page_size': 4, 'ordering': '-id'})
+        self.assertEqual(ids, [item.pk for item in reversed(self.items)])
+
+    def test_filter_is_complete(self):
+        for value, expected in (('false', False), ('true', True)):
+            with self.subTest(is_complete=value):
+                ids, _ = self.walk({'page_size': 2, 'is_complete': value})
+                self.assertEqual(
+                    ids,
+                    [
+                        item.pk
+                        for item in self.items
+                        if item.is_complete == expected
+                    ],
+                )
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, {'page_size': 3, 'is_complete': 'false'}
+            )
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_parameters(self):
+        descending = self.client.get(
+            self.url, {'page_size': 2, 'ordering': '-id'}
+        ).data['next']
+
+        def encode(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode()
+
+        for params in (
+            {'is_complete': 'maybe'},
+            {'ordering': 'name'},
+            {'cursor': 'garbage'},
+            {'cursor': descending},
+            {'cursor': encode('{"i":1e999,"o":0,"d":"n"}')},
+            {'cursor': encode(f'{{"i":{2**64},"o":0,"d":"n"}}')},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+
+    def test_misses(self):
+        other_user = User.objects.create_user(
+            username='bar', email='bar@foo.com', password='foo'
+        )
+        other = Todo.objects.create(name='other', user=other_user)
+        TodoItem.objects.create(name='item', todo=other)
+        empty = Todo.objects.create(name='empty', user=self.user)
+
+        for todo_id, status_code in (
+            (0, status.HTTP_404_NOT_FOUND),
+            (other.pk, status.HTTP_403_FORBIDDEN),
+        ):
+            with self.subTest(todo_id=todo_id):
+                response = self.client.get(
+                    reverse('create_todo_item', kwargs={'id': todo_id})
+                )
+                self.assertEqual(response.status_code, status_code)
+
+        response = self.client.get(
+            reverse('create_todo_item', kwargs={'id': empty.pk})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
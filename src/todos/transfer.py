@@ -0,0 +1,220 @@
+"""
+NDJSON export and import of a user's todos and items.
+
+An export is one JSON object per line: every todo first, as
+``{"type": "todo", "id": ...}``, followed by every item, as
+``{"type": "item", "todo": <todo id>, ...}``. An import reads the same
+format and re-creates the records for another (or the same) user, mapping
+the exported todo ids to the newly created ones.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import events
+from .cache import invalidate_list
+from .models import Todo, TodoItem, TodoStats, Tombstone
+from .serializers import TodoItemSerializer, TodoSerializer
+
+TODO_COLUMNS = ('id', 'name', 'description', 'created_at', 'updated_at')
+ITEM_COLUMNS = ('todo', 'name', 'is_complete', 'created_at', 'updated_at')
+TIMESTAMPS = ('created_at', 'updated_at')
+
+
+class NDJSONImportError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'Line {line}: {message}')
+        self.line = line
+        self.message = message
+
+
+def _dumps(record):
+    return json.dumps(
+        record, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')
+    )
+
+
+def export_ndjson(user, chunk_size=None):
+    """
+    Yield the NDJSON lines for all of ``user``'s todos and items.
+
+    Rows are read with ``values().iterator()``, so memory use is bounded by
+    ``chunk_size`` no matter how much data the user has.
+    """
+    chunk_size = chunk_size or settings.TODOS_STREAM_CHUNK_SIZE
+
+    todos = Todo.objects.filter(user=user).order_by('id').values(*TODO_COLUMNS)
+    for row in todos.iterator(chunk_size=chunk_size):
+        yield _dumps({'type': 'todo', **row}) + '\n'
+
+    items = (
+        TodoItem.objects.filter(todo__user=user)
+        .order_by('todo_id', 'id')
+        .values(*ITEM_COLUMNS)
+    )
+    for row in items.iterator(chunk_size=chunk_size):
+        yield _dumps({'type': 'item', **row}) + '\n'
+
+
+class _Importer:
+    def __init__(self, user, batch_size):
+        self.user = user
+        self.batch_size = batch_size
+        self.todo_ids = {}
+        self.pending_todos = {}
+        self.pending_items = []
+        self.counts = {'todos': 0, 'items': 0}
+        self.completed = 0
+
+    def _validate(self, serializer_class, record, line):
+        serializer = serializer_class(data=record)
+        if not serializer.is_valid():
+            raise NDJSONImportError(line, serializer.errors)
+
+        attrs = dict(serializer.validated_data)
+        for name in TIMESTAMPS:
+            value = record.get(name)
+            if value is None:
+                continue
+            timestamp = None
+            if isinstance(value, str):
+                try:
+                    timestamp = parse_datetime(value)
+                except ValueError:
+                    # Well formed, but out of range: 2024-13-45T00:00:00.
+                    pass
+            if timestamp is None:
+                raise NDJSONImportError(line, f'Invalid {name}: {value!r}.')
+            attrs[name] = timestamp
+        return attrs
+
+    def add_todo(self, record, line):
+        exported_id = record.get('id')
+        if not isinstance(exported_id, int):
+            raise NDJSONImportError(line, 'Todo records need an integer id.')
+        if exported_id in self.todo_ids or exported_id in self.pending_todos:
+            raise NDJSONImportError(line, f'Duplicate todo id {exported_id}.')
+
+        attrs = self._validate(TodoSerializer, record, line)
+        self.pending_todos[exported_id] = Todo(user=self.user, **attrs)
+        if len(self.pending_todos) >= self.batch_size:
+            self.flush_todos()
+
+    def add_item(self, record, line):
+        exported_todo_id = record.get('todo')
+        if not isinstance(exported_todo_id, int):
+            raise NDJSONImportError(line, 'Item records need an integer todo.')
+        if exported_todo_id not in self.todo_ids:
+            self.flush_todos()
+        if exported_todo_id not in self.todo_ids:
+            raise NDJSONImportError(
+                line, f'Item refers to unknown todo {exported_todo_id!r}.'
+            )
+
+        attrs = self._validate(TodoItemSerializer, record, line)
+        item = TodoItem(todo_id=self.todo_ids[exported_todo_id], **attrs)
+        self.pending_items.append(item)
+        if len(self.pending_items) >= self.batch_size:
+            self.flush_items()
+
+    def _create(self, model, objects):
+        # auto_now/auto_now_add always win on insert, so exported timestamps
+        # are written back afterwards in one UPDATE per batch.
+        stamped = [
+            (obj, {name: getattr(obj, name) for name in TIMESTAMPS})
+            for obj in objects
+        ]
+        model.objects.bulk_create(objects)
+
+        restore = []
+        for obj, timestamps in stamped:
+            if all(value is None for value in timestamps.values()):
+                continue
+            for name, value in timestamps.items():
+                if value is not None:
+                    setattr(obj, name, value)
+            restore.append(obj)
+        if restore:
+            model.objects.bulk_update(restore, TIMESTAMPS)
+
+    def flush_todos(self):
+        if not self.pending_todos:
+            return
+        self._create(Todo, list(self.pending_todos.values()))
+        for exported_id, todo in self.pending_todos.items():
+            self.todo_ids[exported_id] = todo.pk
+        self.counts['todos'] += len(self.pending_todos)
+        self.pending_todos = {}
+
+    def flush_items(self):
+        if not self.pending_items:
+            return
+        self._create(TodoItem, self.pending_items)
+        # recount() rather than touch(), which would overwrite the imported
+        # updated_at.
+        Todo.objects.filter(
+            pk__in={item.todo_id for item in self.pending_items}
+        ).recount()
+        self.counts['items'] += len(self.pending_items)
+        self.completed += sum(item.is_complete for item in self.pending_items)
+        self.pending_items = []
+
+
+def import_ndjson(user, lines, batch_size=None):
+    """
+    Create todos and items for ``user`` from an iterable of NDJSON lines.
+
+    Lines are parsed one at a time and written with ``bulk_create`` every
+    ``batch_size`` records, so memory use does not grow with the number of
+    items. Only the exported-to-new todo id mapping is kept for the whole
+    import. Everything runs in one transaction: on ``NDJSONImportError``
+    nothing is written.
+    """
+    importer = _Importer(user, batch_size or settings.TODOS_IMPORT_BATCH_SIZE)
+
+    with transaction.atomic():
+        for number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode()
+                except UnicodeDecodeError:
+                    raise NDJSONImportError(number, 'Invalid UTF-8.')
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise NDJSONImportError(number, 'Invalid JSON.')
+            if not isinstance(record, dict):
+                raise NDJSONImportError(number, 'Expected a JSON object.')
+
+            kind = record.get('type')
+            if kind == 'todo':
+                importer.add_todo(record, number)
+            elif kind == 'item':
+                importer.add_item(record, number)
+            else:
+                raise NDJSONImportError(number, f'Unknown type {kind!r}.')
+
+        importer.flush_todos()
+        importer.flush_items()
+        TodoStats.objects.shift(
+            user.pk,
+            todos=importer.counts['todos'],
+            items=importer.counts['items'],
+            completed=importer.completed,
+        )
+        # Imported records keep their exported timestamps, which a delta
+        # sync would miss: tokens from before now are turned away. Written
+        # last, so that it is as close as possible to the commit.
+        Tombstone.objects.record(user.pk, Tombstone.RESET, [0])
+        events.publish(user.pk, events.RESYNC)
+        invalidate_list(user.pk)
+
+    return importer.counts
@@ -1,10 +1,27 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+todo_views = async_views if settings.TODOS_ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.list_todos, name='list_todos'),
-    path('<int:id>/', views.todo, name='todo'),
-    path('<int:id>/items/', views.create_todo_item, name='create_todo_item'),
-    path('<int:id>/items/<int:iid>/', views.todo_item, name='todo_item'),
+    path('', todo_views.list_todos, name='list_todos'),
+    path('export/', views.export_todos, name='export_todos'),
+    path('import/', views.import_todos, name='import_todos'),
+    path('changes/', views.todo_changes, name='todo_changes'),
+    path('events/', async_views.todo_events, name='todo_events'),
+    path('stats/', todo_views.todo_stats, name='todo_stats'),
+    path('<int:id>/', todo_views.todo, name='todo'),
+    path(
+        '<int:id>/items/',
+        todo_views.create_todo_item,
+        name='create_todo_item',
+    ),
+    path(
+        '<int:id>/items/bulk/', views.bulk_todo_items, name='bulk_todo_items'
+    ),
+    path(
+        '<int:id>/items/<int:iid>/', todo_views.todo_item, name='todo_item'
+    ),
 ]
@@ -1,15 +1,40 @@
 from typing import cast
 
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from drf_spectacular.utils import extend_schema, inline_serializer
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    extend_schema,
+    inline_serializer,
+)
 
-from .models import Todo, TodoItem
-from .serializers import TodoItemSerializer, TodoSerializer
+from . import cache
+from .changes import ChangeTokenError, get_changes
+from .conditional import (
+    not_modified,
+    set_validators,
+    todo_list_validators,
+    todo_validators,
+)
+from .fieldsets import apply_fieldset, get_fieldset
+from .fragments import serialize_todos
+from .models import Todo, TodoItem, TodoStats
+from .pagination import ItemKeysetPagination, KeysetPagination
+from .rows import ITEM_VALUES, render_items, todo_rows
+from .serializers import (
+    TodoItemBulkSerializer,
+    TodoItemSerializer,
+    TodoSerializer,
+    TodoStatsSerializer,
+)
+from .streaming import STREAM_FORMATS, stream_todos
+from .transfer import NDJSONImportError, export_ndjson, import_ndjson
 
 
 def _bad_request(errors):
@@ -23,9 +48,133 @@ def _forbidden():
     )
 
 
+# Todos and items are looked up through for_user(), so that one query finds
+# the object and checks its owner. Only a miss looks further, to tell a
+# missing object (404) from someone else's (403) or an item of another
+# todo (400).
+def _todo_miss(id):
+    get_object_or_404(Todo.objects.only('id'), id=id)
+    return _forbidden()
+
+
+def _item_miss(request, id, iid):
+    todo = get_object_or_404(Todo.objects.only('user'), id=id)
+    if todo.user_id != request.user.pk:
+        return _forbidden()
+    get_object_or_404(TodoItem.objects.only('id'), id=iid)
+    error = {'error': 'This Todo has no Item matching the iid provided.'}
+    return _bad_request(error)
+
+
+# PATCH validates and writes only the fields sent, in one UPDATE filtered on
+# the owner.
+def _patch_todo(request, id):
+    serializer = TodoSerializer(data=request.data, partial=True)
+    if not serializer.is_valid():
+        return _bad_request(serializer.errors)
+
+    data = serializer.validated_data
+    if not Todo.objects.patch(id, request.user.pk, **data):
+        return _todo_miss(id)
+    return Response(
+        {'message': 'Todo updated successfully'}, status=status.HTTP_200_OK
+    )
+
+
+def _patch_todo_item(request, id, iid):
+    serializer = TodoItemSerializer(data=request.data, partial=True)
+    if not serializer.is_valid():
+        return _bad_request(serializer.errors)
+
+    data = serializer.validated_data
+    if not TodoItem.objects.patch(iid, id, request.user.pk, **data):
+        return _item_miss(request, id, iid)
+    return Response(
+        {'message': 'Item updated successfully'}, status=status.HTTP_200_OK
+    )
+
+
+def _wants_pagination(request):
+    return request.query_params.get('paginate', 'true').lower() != 'false'
+
+
+def _list_todos(request):
+    fieldset = get_fieldset(request)
+    rows = todo_rows(Todo.objects.filter(user=request.user), fieldset)
+
+    stream_format = request.query_params.get('stream')
+    if stream_format is not None:
+        if stream_format not in STREAM_FORMATS:
+            return _bad_request(
+                {'stream': f'Must be one of: {", ".join(STREAM_FORMATS)}.'}
+            )
+        return stream_todos(rows, stream_format, fieldset)
+
+    # Items are loaded by serialize_todos, only for todos it has no
+    # cached fragment for.
+    if not _wants_pagination(request):
+        data = serialize_todos(rows, fieldset)
+        return Response(data, status=status.HTTP_200_OK)
+
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(rows, request)
+    return paginator.get_paginated_response(serialize_todos(page, fieldset))
+
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        str,
+        description=(
+            'Comma-separated todo fields to return, e.g. `id,name`. '
+            'Defaults to every field.'
+        ),
+    ),
+    OpenApiParameter(
+        'include',
+        str,
+        description=(
+            'Comma-separated relations to embed (`items`). When `fields` is '
+            'given without `include`, items are left out.'
+        ),
+    ),
+]
+
+
 @extend_schema(
     methods=['GET'],
-    responses={200: TodoSerializer(many=True)},
+    operation_id='todos_list',
+    parameters=[
+        OpenApiParameter(
+            'cursor', str, description='Opaque cursor from `next`/`prev`.'
+        ),
+        OpenApiParameter('page_size', int, description='Todos per page.'),
+        OpenApiParameter(
+            'paginate',
+            bool,
+            description='Pass `false` to get every todo as a plain list.',
+        ),
+        OpenApiParameter(
+            'stream',
+            str,
+            enum=STREAM_FORMATS,
+            description=(
+                'Stream every todo as a JSON array or as NDJSON, '
+                'ignoring pagination.'
+            ),
+        ),
+        *FIELDSET_PARAMETERS,
+    ],
+    responses={
+        200: inline_serializer(
+            name='PaginatedTodoList',
+            fields={
+                'next': serializers.CharField(allow_null=True),
+                'prev': serializers.CharField(allow_null=True),
+                'results': TodoSerializer(many=True),
+            },
+        )
+    },
 )
 @extend_schema(
     methods=['POST'],
@@ -44,9 +193,31 @@ def _forbidden():
 @permission_classes([IsAuthenticated])
 def list_todos(request):
     if request.method == 'GET':
-        todos = Todo.objects.prefetch_related('items').filter(user=request.user)
-        serializer = TodoSerializer(todos, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if 'stream' in request.query_params:
+            validators = todo_list_validators(request)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
+            return set_validators(_list_todos(request), validators)
+
+        cached = cache.get_list(request)
+        if cached is not None:
+            validators = cached['validators']
+            response = not_modified(request, validators)
+            if response is None:
+                response = Response(cached['data'], status=status.HTTP_200_OK)
+            response['X-Cache'] = 'HIT'
+            return set_validators(response, validators)
+
+        validators = todo_list_validators(request)
+        response = not_modified(request, validators)
+        if response is None:
+            response = _list_todos(request)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set_list(request, response.data, validators)
+        if cache.is_enabled():
+            response['X-Cache'] = 'MISS'
+        return set_validators(response, validators)
 
     if request.method == 'POST':
         serializer = TodoSerializer(data=request.data)
@@ -62,10 +233,11 @@ def list_todos(request):
 
 @extend_schema(
     methods=['GET'],
+    parameters=FIELDSET_PARAMETERS,
     responses={200: TodoSerializer},
 )
 @extend_schema(
-    methods=['PUT'],
+    methods=['PUT', 'PATCH'],
     request=TodoSerializer,
     responses={
         200: inline_serializer(
@@ -83,16 +255,29 @@ def list_todos(request):
         )
     },
 )
-@api_view(['GET', 'PUT', 'DELETE'])
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def todo(request, id):
-    todo = get_object_or_404(Todo.objects.prefetch_related('items'), id=id)
-    if todo.user != request.user:
-        return _forbidden()
+    if request.method == 'PATCH':
+        return _patch_todo(request, id)
 
+    validators = None
     if request.method == 'GET':
-        serializer = TodoSerializer(todo)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        validators = todo_validators(request, id)
+        response = not_modified(request, validators)
+        if response is not None:
+            return response
+
+    fieldset = get_fieldset(request) if request.method == 'GET' else None
+    todos = apply_fieldset(Todo.objects.for_user(request.user), fieldset)
+    todo = todos.filter(id=id).first()
+    if todo is None:
+        return _todo_miss(id)
+
+    if request.method == 'GET':
+        serializer = TodoSerializer(todo, fields=fieldset)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        return set_validators(response, validators)
 
     if request.method == 'PUT':
         serializer = TodoSerializer(todo, data=request.data)
@@ -111,7 +296,57 @@ def todo(request, id):
         )
 
 
+def _item_rows(request, id):
+    """
+    Item rows of ``request.user``'s todo ``id``, narrowed by the
+    ``is_complete`` query parameter.
+    """
+    items = TodoItem.objects.for_user(request.user, todo_id=id)
+    value = request.query_params.get('is_complete')
+    if value is not None:
+        try:
+            is_complete = serializers.BooleanField().to_internal_value(value)
+        except serializers.ValidationError:
+            raise serializers.ValidationError(
+                {'is_complete': 'Must be true or false.'}
+            )
+        items = items.filter(is_complete=is_complete)
+    return items.values(*ITEM_VALUES)
+
+
 @extend_schema(
+    methods=['GET'],
+    operation_id='todos_items_list',
+    parameters=[
+        OpenApiParameter(
+            'is_complete', bool, description='Only list these items.'
+        ),
+        OpenApiParameter(
+            'ordering',
+            str,
+            enum=ItemKeysetPagination.orderings,
+            description=(
+                '`id` for creation order (default), `-id` for newest first.'
+            ),
+        ),
+        OpenApiParameter(
+            'cursor', str, description='Opaque cursor from `next`/`prev`.'
+        ),
+        OpenApiParameter('page_size', int, description='Items per page.'),
+    ],
+    responses={
+        200: inline_serializer(
+            name='PaginatedTodoItemList',
+            fields={
+                'next': serializers.CharField(allow_null=True),
+                'prev': serializers.CharField(allow_null=True),
+                'results': TodoItemSerializer(many=True),
+            },
+        )
+    },
+)
+@extend_schema(
+    methods=['POST'],
     request=TodoItemSerializer,
     responses={
         200: inline_serializer(
@@ -120,12 +355,22 @@ def todo(request, id):
         )
     },
 )
-@api_view(['POST'])
+@api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def create_todo_item(request, id):
-    todo = get_object_or_404(Todo, id=id)
-    if todo.user != request.user:
-        return _forbidden()
+    if request.method == 'GET':
+        paginator = ItemKeysetPagination()
+        page = paginator.paginate_queryset(_item_rows(request, id), request)
+        # The rows are filtered on the owner: an empty page may be a miss.
+        if not page:
+            owned = Todo.objects.for_user(request.user).filter(id=id)
+            if not owned.exists():
+                return _todo_miss(id)
+        return paginator.get_paginated_response(render_items(page))
+
+    todo = Todo.objects.for_user(request.user).filter(id=id).first()
+    if todo is None:
+        return _todo_miss(id)
 
     serializer = TodoItemSerializer(data=request.data)
     if not serializer.is_valid():
@@ -142,7 +387,7 @@ def create_todo_item(request, id):
     responses={200: TodoItemSerializer},
 )
 @extend_schema(
-    methods=['PUT'],
+    methods=['PUT', 'PATCH'],
     request=TodoItemSerializer,
     responses={
         200: inline_serializer(
@@ -160,17 +405,16 @@ def create_todo_item(request, id):
         )
     },
 )
-@api_view(['GET', 'PUT', 'DELETE'])
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def todo_item(request, id, iid):
-    todo = get_object_or_404(Todo, id=id)
-    if todo.user != request.user:
-        return _forbidden()
+    if request.method == 'PATCH':
+        return _patch_todo_item(request, id, iid)
 
-    item = get_object_or_404(TodoItem, id=iid)
-    if item.todo != todo:
-        error = {'error': 'This Todo has no Item matching the iid provided.'}
-        return _bad_request(error)
+    items = TodoItem.objects.for_user(request.user, todo_id=id)
+    item = items.filter(id=iid).first()
+    if item is None:
+        return _item_miss(request, id, iid)
 
     if request.method == 'GET':
         serializer = TodoItemSerializer(item)
@@ -191,3 +435,153 @@ def todo_item(request, id, iid):
         return Response(
             {'message': 'Item deleted successfully'}, status=status.HTTP_200_OK
         )
+
+
+@extend_schema(
+    request=TodoItemBulkSerializer,
+    responses={
+        200: inline_serializer(
+            name='TodoItemBulkResponse',
+            fields={
+                'message': serializers.CharField(),
+                'created': serializers.ListField(
+                    child=serializers.IntegerField()
+                ),
+                'updated': serializers.ListField(
+                    child=serializers.IntegerField()
+                ),
+                'deleted': serializers.ListField(
+                    child=serializers.IntegerField()
+                ),
+            },
+        )
+    },
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_todo_items(request, id):
+    todo = Todo.objects.for_user(request.user).filter(id=id).first()
+    if todo is None:
+        return _todo_miss(id)
+
+    serializer = TodoItemBulkSerializer(data=request.data)
+    if not serializer.is_valid():
+        return _bad_request(serializer.errors)
+
+    result = serializer.save(todo=todo)
+    return Response(
+        {'message': 'Items updated successfully', **result},
+        status=status.HTTP_200_OK,
+    )
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            'since',
+            str,
+            description=(
+                '`token` from the previous response. Omit it for a full sync.'
+            ),
+        ),
+    ],
+    responses={
+        200: inline_serializer(
+            name='TodoChanges',
+            fields={
+                'todos': TodoSerializer(
+                    many=True,
+                    help_text='Created or updated todos, without items.',
+                ),
+                'items': TodoItemSerializer(
+                    many=True, help_text='Created or updated items.'
+                ),
+                'deleted': inline_serializer(
+                    name='TodoDeletions',
+                    fields={
+                        'todos': serializers.ListField(
+                            child=serializers.IntegerField()
+                        ),
+                        'items': serializers.ListField(
+                            child=serializers.IntegerField()
+                        ),
+                    },
+                ),
+                'token': serializers.CharField(),
+            },
+        ),
+        410: inline_serializer(
+            name='TodoChangesExpired',
+            fields={'error': serializers.CharField()},
+        ),
+    },
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def todo_changes(request):
+    try:
+        changes = get_changes(request.user, request.query_params.get('since'))
+    except ChangeTokenError as exc:
+        if exc.expired:
+            return Response(
+                {'error': exc.message}, status=status.HTTP_410_GONE
+            )
+        return _bad_request({'since': exc.message})
+
+    return Response(changes, status=status.HTTP_200_OK)
+
+
+@extend_schema(responses={200: TodoStatsSerializer})
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def todo_stats(request):
+    # Built from the user's todos the first time, then kept up to date.
+    stats = TodoStats.objects.filter(pk=request.user.pk).first()
+    if stats is None:
+        stats = TodoStats.objects.rebuild(request.user.pk)
+    serializer = TodoStatsSerializer(stats)
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    responses={
+        (200, 'application/x-ndjson'): OpenApiTypes.STR,
+    },
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_todos(request):
+    response = StreamingHttpResponse(
+        export_ndjson(request.user), content_type='application/x-ndjson'
+    )
+    response['Content-Disposition'] = 'attachment; filename="todos.ndjson"'
+    return response
+
+
+@extend_schema(
+    request={'application/x-ndjson': OpenApiTypes.STR},
+    responses={
+        200: inline_serializer(
+            name='TodoImportResponse',
+            fields={
+                'message': serializers.CharField(),
+                'todos': serializers.IntegerField(),
+                'items': serializers.IntegerField(),
+            },
+        )
+    },
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_todos(request):
+    # Read the raw body line by line instead of through request.data, so the
+    # upload is never held in memory as a whole.
+    try:
+        counts = import_ndjson(request.user, request.stream or [])
+    except NDJSONImportError as exc:
+        return _bad_request({'error': exc.message, 'line': exc.line})
+
+    return Response(
+        {'message': 'Todos imported successfully', **counts},
+        status=status.HTTP_200_OK,
+    )